@@ -1,14 +1,26 @@
+import hashlib
+import time
+import uuid
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from jose import JWTError,jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.database import SessionLocal
+from sqlalchemy import select, delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db, session_scope, delete_in_batches
 from app.models.token import Token as TokenModel
+from app.models.token_revocation import TokenRevocation
 from app.models.user import User as UserModel
 from passlib.context import CryptContext
-from typing import Annotated
+from typing import Annotated, Optional
 from app.schemas.token import TokenData
+from app.schemas.user import User as UserSchema
+from app.config import settings
+from app.utils.cache import TTLCache
+from app.utils.worker_pool import BoundedExecutor
+from app.utils.periodic import PeriodicTask
+from app.utils.token_revocation import revocation_filter
 
 #from dotenv import load_dotenv
 
@@ -18,30 +30,66 @@ SECRET_KEY = "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 240
 
+# "database": every token is checked against the tokens table and the user row
+# (results cached in auth_cache). "stateless": the signed claims are trusted
+# and only checked against the in-memory revocation filter, so no query is made.
+AUTH_MODES = ("database", "stateless")
+if settings.auth_mode not in AUTH_MODES:
+    raise ValueError(f"Unknown auth mode: {settings.auth_mode}")
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
+
+# bcrypt is deliberately slow; run it on its own small pool so logins never
+# stall the event loop or take over FastAPI's threadpool
+password_hash_pool = BoundedExecutor(
+    ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="password-hash"),
+    max_pending=settings.password_hash_workers + settings.password_hash_max_queue,
+    name="Password hashing",
+)
 credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+# Validated access token -> snapshot of its active user. Entries never outlive
+# the token itself, and are dropped by revoke_token / deactivate_user.
+auth_cache = TTLCache(maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl)
+# Stateless mode: token -> (user, jti, ver, act) from its verified claims, so
+# repeat requests skip the signature check. Revocation is checked every time.
+claims_cache = TTLCache(maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl)
+
+def hash_token(token: str) -> str:
+    """Fixed-length key under which an access token is stored and looked up."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
 def verify_password(plain_password, hashed_password) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password) -> str:
     return pwd_context.hash(password)
 
-def get_user(db: Session, username: str)->UserModel:
-    return db.query(UserModel).filter(UserModel.username == username).first()
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password) -> str:
+    return await password_hash_pool.run(get_password_hash, password)
+
+async def get_user(db: AsyncSession, username: str)->UserModel:
+    return (await db.scalars(select(UserModel).where(UserModel.username == username))).first()
 
-def authenticate_user(db: Session, username: str, password: str) -> UserModel:
-    user = get_user(db, username)
-    if not user or not verify_password(password, user.hashed_password):
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> UserModel:
+    user = await get_user(db, username)
+    # Give the connection back to the pool while bcrypt runs; the loaded
+    # user stays readable and the session reconnects on its next query
+    await db.close()
+    if not user or not await verify_password_async(password, user.hashed_password):
         return False
     return user
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)],db: Session = Depends(lambda: SessionLocal())) -> UserModel:
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)],db: AsyncSession = Depends(get_async_db)) -> UserModel:
     
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -50,50 +98,176 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)],db: Ses
         if username is None:
             raise credentials_exception        
         token_data = TokenData(username=username)
-        user = get_user(db, username=token_data.username)
+        user = await get_user(db, username=token_data.username)
     except JWTError:
         raise credentials_exception
     if user is None:
         raise credentials_exception
     return user
 
+def token_claims(user: UserModel) -> dict:
+    """Claims describing ``user`` in its access tokens, trusted as is in the stateless auth mode."""
+    return {
+        "sub": user.username,
+        "uid": user.id,
+        "email": user.email,
+        "act": bool(user.is_active),
+        "ver": user.token_version or 0,
+        "created_at": user.created_at.isoformat() if user.created_at else None,
+    }
+
+def _user_from_claims(token: str) -> Optional[UserSchema]:
+    """
+    The user of a token from its signed claims alone, or None when the token
+    has to be checked against the database instead: it predates these
+    claims, or the revocation filter is not up to date.
+    """
+    if not revocation_filter.fresh():
+        return None
+    entry = claims_cache.get(token)
+    if entry is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            raise credentials_exception
+        if "jti" not in payload:
+            return None
+        try:
+            # The claims were signed by create_access_token, so they are not validated again
+            user = UserSchema.model_construct(
+                id=payload["uid"],
+                username=payload["sub"],
+                email=payload["email"],
+                is_active=True,
+                created_at=datetime.fromisoformat(payload["created_at"]) if payload["created_at"] else None,
+            )
+            entry = (user, payload["jti"], payload["ver"], payload["act"])
+        except KeyError:
+            raise credentials_exception
+        # exp is compared on the same clock python-jose checks it with
+        claims_cache.set(token, entry, min(settings.auth_cache_ttl, payload["exp"] - time.time()))
+    user, jti, version, active = entry
+    if revocation_filter.is_revoked(jti, user.username, version):
+        raise credentials_exception
+    if not active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return user
+
 async def get_current_active_user(
-    current_user: Annotated[UserModel, Depends(get_current_user)],
     token: Annotated[str, Depends(oauth2_scheme)],
-    db: Session = Depends(lambda: SessionLocal())
-):
+    db: AsyncSession = Depends(get_async_db)
+) -> UserSchema:
+    if settings.auth_mode == "stateless":
+        user = _user_from_claims(token)
+        if user is not None:
+            return user
+
+    # Tokens validated recently are served from the cache without any query
+    cached_user = auth_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+
+    current_user = await get_current_user(token, db)
+
     # Check if user is active
     if current_user.is_active == False:
         raise HTTPException(status_code=400, detail="Inactive user")
      
      # Check if token exists in database and is not expired
     db_token = (
-            db.query(TokenModel)
-            .filter(TokenModel.access_token == token)
-            .filter(TokenModel.expires_at > datetime.now())
-            .first()
-    )
+        await db.scalars(
+            select(TokenModel)
+            .where(TokenModel.token_hash == hash_token(token))
+            .where(TokenModel.expires_at > datetime.now())
+        )
+    ).first()
     if not db_token:
         raise credentials_exception
-    return current_user
 
-def create_access_token(data: Annotated[dict, Depends()]):
-    """Create a new access token."""
+    user = UserSchema.model_validate(current_user)
+    remaining = (db_token.expires_at - datetime.now()).total_seconds()
+    auth_cache.set(token, user, min(settings.auth_cache_ttl, remaining))
+    return user
+
+def invalidate_token(token: str):
+    """Forget a cached token so its next use is checked against the database again."""
+    auth_cache.pop(token)
+    claims_cache.pop(token)
+
+def invalidate_user(username: str):
+    """Forget every cached token of a user."""
+    auth_cache.pop_where(lambda token, user: user.username == username)
+
+def _revocation_expiry() -> datetime:
+    # Any token a revocation written now applies to has expired by then
+    return datetime.now() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+
+async def revoke_token(db: AsyncSession, token: str):
+    """Delete an access token, record its revocation for the stateless mode and drop it from the cache."""
+    await db.execute(delete(TokenModel).where(TokenModel.token_hash == hash_token(token)))
+    try:
+        jti = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("jti")
+    except JWTError:
+        jti = None
+    expires_at = _revocation_expiry()
+    if jti is not None:
+        db.add(TokenRevocation(jti=jti, expires_at=expires_at))
+    await db.commit()
+    invalidate_token(token)
+    if jti is not None:
+        revocation_filter.revoke(jti, expires_at)
+
+async def deactivate_user(db: AsyncSession, username: str):
+    """Mark a user inactive and revoke all of their tokens, cached or not."""
+    # Tokens carry the version they were issued under; bumping it revokes them all
+    await db.execute(
+        update(UserModel)
+        .where(UserModel.username == username)
+        .values(is_active=False, token_version=UserModel.token_version + 1)
+    )
+    version = await db.scalar(select(UserModel.token_version).where(UserModel.username == username))
+    # Revoked tokens must not be handed out again by login once the user is reactivated
+    await db.execute(delete(TokenModel).where(TokenModel.username == username))
+    expires_at = _revocation_expiry()
+    if version is not None:
+        db.add(TokenRevocation(username=username, token_version=version, expires_at=expires_at))
+    await db.commit()
+    invalidate_user(username)
+    if version is not None:
+        revocation_filter.revoke_user(username, version, expires_at)
+
+async def create_access_token(data: dict, db: AsyncSession):
+    """Create a new access token and store it in the database."""
     to_encode = data.copy()
     expire = datetime.now() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     #encoded_jwt = "test"
 
     # Store token in database
-    db = SessionLocal()
     db_token = TokenModel(
         username=data["sub"],
         access_token=encoded_jwt,
+        token_hash=hash_token(encoded_jwt),
         expires_at=expire
     )
     db.add(db_token)
-    db.commit()
-    db.close()
+    await db.commit()
     
     return encoded_jwt
+
+def sweep_expired_tokens() -> dict:
+    """Delete expired tokens and revocations in batches. Runs in the threadpool every token_sweep_interval seconds."""
+    now = datetime.now()
+    with session_scope() as db:
+        deleted = delete_in_batches(
+            db, TokenModel, TokenModel.expires_at <= now,
+            settings.token_sweep_batch_size, settings.token_sweep_pause,
+        )
+        deleted_revocations = delete_in_batches(
+            db, TokenRevocation, TokenRevocation.expires_at <= now,
+            settings.token_sweep_batch_size, settings.token_sweep_pause,
+        )
+    return {"deleted_tokens": deleted, "deleted_revocations": deleted_revocations}
+
+token_sweeper = PeriodicTask("Expired token sweep", sweep_expired_tokens, interval=settings.token_sweep_interval)
@@ -0,0 +1,124 @@
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """Application settings, overridable through environment variables or a .env file."""
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    database_url: str = "mysql+pymysql://user:password@db/product_db"
+    # Defaults to database_url with its driver swapped for aiomysql / aiosqlite
+    async_database_url: str = ""
+    # Optional read replica for read-only endpoints (same URL format as database_url)
+    read_replica_url: str = ""
+    # Reads fall back to the primary when the replica lags more than this many seconds
+    read_replica_max_lag: float = 5.0
+    read_replica_check_interval: float = 5.0
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    # Seconds to wait for a free connection before failing the request
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 3600
+    db_pool_pre_ping: bool = True
+
+    # API request logging
+    # "sync" writes each log row in the request path, "batched" queues rows
+    # for the background writer in app.middleware.log_writer
+    api_log_mode: str = "sync"
+    api_log_queue_size: int = 10000
+    api_log_batch_size: int = 500
+    api_log_flush_interval: float = 1.0
+    # What to do when the queue is full: "drop_new", "drop_oldest" or "block"
+    api_log_overflow_policy: str = "drop_new"
+    # Max seconds a request waits for queue space under the "block" policy
+    api_log_block_timeout: float = 0.05
+    # Only this many leading bytes of each request/response body are logged
+    api_log_max_body_bytes: int = 4096
+    # Retention: raw api_logs rows are summarized into api_log_rollups
+    # (per minute, route and method), then deleted after api_log_retention_days
+    api_log_maintenance: bool = True
+    api_log_maintenance_interval: float = 60.0
+    api_log_retention_days: float = 7.0
+    api_log_rollup_retention_days: float = 90.0
+    # Minutes are rolled up once they are this many seconds old
+    api_log_rollup_settle_seconds: float = 120.0
+    api_log_rollup_window_minutes: int = 10
+    # Rows deleted per transaction, and seconds to pause between batches
+    api_log_delete_batch_size: int = 5000
+    api_log_delete_pause: float = 0.1
+
+    # Prometheus metrics served at /metrics
+    metrics_enabled: bool = True
+    # Upper bounds of the request latency histogram buckets, in seconds
+    metrics_latency_buckets: str = "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10"
+    # Where each worker publishes its counters for the others; required with more
+    # than one worker, and emptied before the server starts. Unset, each worker
+    # only reports its own counters
+    metrics_dir: str = ""
+    metrics_publish_interval: float = 5.0
+
+    # Cache of validated access tokens used by get_current_active_user
+    auth_cache_size: int = 10000
+    auth_cache_ttl: float = 60.0
+
+    # "database" checks each access token against the tokens table (cached in
+    # auth_cache), "stateless" trusts the signed claims and only checks them
+    # against an in-memory revocation filter
+    auth_mode: str = "database"
+    # Seconds between reads of new token_revocations rows in the stateless mode
+    auth_revocation_refresh_interval: float = 5.0
+    # The stateless mode falls back to database checks while the last successful
+    # refresh of the revocation filter is older than this
+    auth_revocation_max_staleness: float = 60.0
+
+    # Expired rows are deleted from the tokens table every token_sweep_interval seconds
+    token_sweep: bool = True
+    token_sweep_interval: float = 300.0
+    token_sweep_batch_size: int = 5000
+    token_sweep_pause: float = 0.1
+
+    # Serialized category list/detail responses, cleared on every category write
+    category_cache_size: int = 1000
+    category_cache_ttl: float = 300.0
+
+    # max-age of Cache-Control on product/category responses; clients revalidate with If-None-Match after it
+    http_cache_max_age: int = 0
+
+    # Password hashing
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 4
+    # Hash/verify calls allowed to wait for a worker before returning 503
+    password_hash_max_queue: int = 64
+
+    # Product image uploads
+    upload_dir: str = "uploads"
+    image_upload_max_bytes: int = 20 * 1024 * 1024
+    image_upload_chunk_size: int = 1024 * 1024
+    # Derivatives rendered after upload, as name=longest edge in pixels
+    image_variants: str = "thumb=200,medium=800"
+    image_variant_format: str = "webp"
+    image_variant_quality: int = 80
+    image_variant_workers: int = 2
+    # Renders allowed to wait for a worker before returning 503
+    image_variant_max_queue: int = 32
+
+    # In-memory cache of small files served from /uploads (thumbnails)
+    uploads_hot_cache_bytes: int = 64 * 1024 * 1024
+    uploads_hot_file_max_bytes: int = 256 * 1024
+
+    # PDF invoices
+    invoice_workers: int = 2
+    # Renders allowed to wait for a worker before returning 503
+    invoice_max_queue: int = 32
+    # Code128 drawings kept per worker process, keyed by barcode data
+    invoice_barcode_cache_size: int = 1024
+    # Batch rendering (POST /invoices/batch and python pdf.py --batch)
+    invoice_batch_workers: int = 4
+    # Invoices sent to a worker at a time
+    invoice_batch_chunk_size: int = 16
+    invoice_batch_max_invoices: int = 10000
+    # Batches running at once per API worker; further batches get 503
+    invoice_batch_max_running: int = 1
+
+
+settings = Settings()
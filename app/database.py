@@ -1,23 +1,112 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, BigInteger, select, delete
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from typing import AsyncIterator, Optional
+import threading
 import time
-from sqlalchemy.exc import OperationalError
+from contextlib import contextmanager
+from sqlalchemy.exc import OperationalError, InterfaceError, TimeoutError as PoolTimeoutError
+from app.config import settings
 
-SQLALCHEMY_DATABASE_URL = "mysql+pymysql://user:password@db/product_db"
+SQLALCHEMY_DATABASE_URL = settings.database_url
+
+# SQLite only auto-increments INTEGER PRIMARY KEY columns, so render BigInteger
+# as INTEGER there to keep the BigInteger ids usable for local runs and benchmarks
+@compiles(BigInteger, "sqlite")
+def _compile_big_integer_sqlite(type_, compiler, **kw):
+    return "INTEGER"
+
+# Async drivers used when ASYNC_DATABASE_URL is not set explicitly
+ASYNC_DRIVERS = {
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_database_url(url: str) -> str:
+    """Swap the driver of a sync database URL for its asyncio counterpart."""
+    scheme, separator, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + separator + rest
+
+ASYNC_DATABASE_URL = settings.async_database_url or get_async_database_url(SQLALCHEMY_DATABASE_URL)
+
+class _PoolStatsMixin:
+    """Counts created connections and how long checkouts wait, on top of a QueuePool."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.connections_created = 0
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+
+    def _create_connection(self):
+        with self._stats_lock:
+            self.connections_created += 1
+        return super()._create_connection()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.checkout_timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.checkout_wait_total += waited
+                self.checkout_wait_max = max(self.checkout_wait_max, waited)
+
+    def stats(self) -> dict:
+        return {
+            "pool_size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": self.overflow(),
+            "max_overflow": self._max_overflow,
+            "connections_created": self.connections_created,
+            "checkouts": self.checkouts,
+            "checkout_timeouts": self.checkout_timeouts,
+            "checkout_wait_avg_ms": self.checkout_wait_total / self.checkouts * 1000 if self.checkouts else 0.0,
+            "checkout_wait_max_ms": self.checkout_wait_max * 1000,
+        }
+
+class InstrumentedQueuePool(_PoolStatsMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(_PoolStatsMixin, AsyncAdaptedQueuePool):
+    pass
 
 def create_db_engine():
     max_retries = 5
     retry_count = 0
     while retry_count < max_retries:
         try:
+            connect_args = {}
+            if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+                # Sessions are used from FastAPI's threadpool
+                connect_args["check_same_thread"] = False
             engine = create_engine(
                 SQLALCHEMY_DATABASE_URL,
-                pool_pre_ping=True,
-                pool_recycle=3600
+                poolclass=InstrumentedQueuePool,
+                pool_size=settings.db_pool_size,
+                max_overflow=settings.db_max_overflow,
+                pool_timeout=settings.db_pool_timeout,
+                pool_recycle=settings.db_pool_recycle,
+                pool_pre_ping=settings.db_pool_pre_ping,
+                connect_args=connect_args
             )
             # Test the connection
-            engine.connect()
+            with engine.connect():
+                pass
             return engine
         except OperationalError as e:
             retry_count += 1
@@ -29,11 +118,177 @@ def create_db_engine():
 engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def create_async_db_engine(url: str):
+    return create_async_engine(
+        url,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+
+# Route handlers use the asyncio engine so queries never block the event loop
+# or occupy the threadpool; the sync engine above serves middleware, background
+# jobs and streaming exports
+async_engine = create_async_db_engine(ASYNC_DATABASE_URL)
+# Objects stay readable after commit, since lazy refreshes are not possible with asyncio
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+class ReplicaHealth:
+    """
+    Decides whether reads may go to the replica: it must accept connections and
+    be no more than ``max_lag`` seconds behind the primary. The check runs at
+    most once every ``interval`` seconds; in between the last verdict is reused,
+    unless a read on the replica fails, which takes it out of use at once.
+    """
+
+    def __init__(self, engine, max_lag: float, interval: float):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.interval = interval
+        self.available = True
+        self.lag: Optional[float] = None
+        self.checks = 0
+        self.failures = 0
+        self._checked_at = float("-inf")
+
+    async def is_available(self) -> bool:
+        now = time.monotonic()
+        if now - self._checked_at < self.interval:
+            return self.available
+        # Claim this check so concurrent requests keep using the previous verdict
+        self._checked_at = now
+        self.checks += 1
+        try:
+            async with self.engine.connect() as conn:
+                await conn.exec_driver_sql("SELECT 1")
+                self.lag = await self._replication_lag(conn)
+            self.available = self.lag is None or self.lag <= self.max_lag
+        except Exception as e:
+            self.mark_failed(e)
+        return self.available
+
+    def mark_failed(self, error: Exception):
+        """Send reads to the primary until the next check finds the replica healthy again."""
+        print(f"Read replica unavailable, reading from primary: {str(error)}")
+        self.failures += 1
+        self.available = False
+        self._checked_at = time.monotonic()
+
+    async def _replication_lag(self, conn) -> Optional[float]:
+        """
+        Seconds the replica is behind, or None where the database cannot tell (anything but MySQL)
+
+        On MySQL a lag that cannot be read raises, so the replica is not used:
+        the status query failing (e.g. missing REPLICATION CLIENT privilege),
+        no replication configured, or a NULL Seconds_Behind_Source because the
+        replication threads have stopped.
+        """
+        if conn.dialect.name != "mysql":
+            return None
+        status = (await conn.exec_driver_sql("SHOW REPLICA STATUS")).mappings().first()
+        if status is None:
+            raise RuntimeError("replication is not configured on the replica")
+        if status.get("Seconds_Behind_Source") is None:
+            raise RuntimeError("replication is not running (Seconds_Behind_Source is NULL)")
+        return float(status["Seconds_Behind_Source"])
+
+    def stats(self) -> dict:
+        return {
+            "available": self.available,
+            "lag_seconds": self.lag,
+            "max_lag_seconds": self.max_lag,
+            "checks": self.checks,
+            "failures": self.failures,
+        }
+
+# Optional read replica for read-only handlers, see get_read_db
+read_async_engine = None
+ReadAsyncSessionLocal = None
+replica_health = None
+if settings.read_replica_url:
+    read_async_engine = create_async_db_engine(get_async_database_url(settings.read_replica_url))
+    ReadAsyncSessionLocal = async_sessionmaker(read_async_engine, autoflush=False, expire_on_commit=False)
+    replica_health = ReplicaHealth(
+        read_async_engine,
+        max_lag=settings.read_replica_max_lag,
+        interval=settings.read_replica_check_interval,
+    )
+
 Base = declarative_base()
 
-def get_db():
+@contextmanager
+def session_scope():
+    """Session for code outside a request (middleware, background tasks), always closed on exit."""
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+def delete_in_batches(db, model, condition, batch_size: int, pause: float) -> int:
+    """
+    Delete the rows of ``model`` matching ``condition``, ``batch_size`` at a time
+
+    Each batch is its own short transaction, so row locks and undo/replication
+    volume stay bounded however much there is to delete. Sleeps ``pause``
+    seconds between batches to let replicas and concurrent writers catch up.
+    """
+    deleted = 0
+    while True:
+        ids = db.scalars(select(model.id).where(condition).limit(batch_size)).all()
+        if not ids:
+            return deleted
+        db.execute(delete(model).where(model.id.in_(ids)))
+        db.commit()
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            return deleted
+        time.sleep(pause)
+
+def get_db():
+    """Request-scoped sync session dependency."""
+    with session_scope() as db:
+        yield db
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """Request-scoped AsyncSession on the primary; every write and auth check gets its session here."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_read_db() -> AsyncIterator[AsyncSession]:
+    """
+    AsyncSession for read-only handlers. Uses the read replica when one is
+    configured and healthy, otherwise the primary. Handlers that must see
+    their own writes should use get_async_db instead.
+    """
+    use_replica = ReadAsyncSessionLocal is not None and await replica_health.is_available()
+    async with (ReadAsyncSessionLocal if use_replica else AsyncSessionLocal)() as db:
+        try:
+            yield db
+        except (OperationalError, InterfaceError) as e:
+            # The request fails, but the following ones read from the primary
+            # instead of waiting for the next health check
+            if use_replica:
+                replica_health.mark_failed(e)
+            raise
+
+async def dispose_engines():
+    await async_engine.dispose()
+    if read_async_engine is not None:
+        await read_async_engine.dispose()
+
+def pool_stats() -> dict:
+    stats = {
+        "sync": engine.pool.stats(),
+        "async": async_engine.sync_engine.pool.stats(),
+    }
+    if read_async_engine is not None:
+        stats["replica"] = {
+            **read_async_engine.sync_engine.pool.stats(),
+            **replica_health.stats(),
+        }
+    return stats
+ 
\ No newline at end of file
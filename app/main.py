@@ -1,7 +1,18 @@
 from fastapi import FastAPI
-from app.routes import category_routes, product_routes, product_image_routes,token_routes
+from app.routes import category_routes, product_routes, product_image_routes,token_routes, export_routes, internal_routes, invoice_routes
 from app.middleware.api_logger import APILoggerMiddleware
+from app.middleware.log_writer import log_writer
+from app.middleware.metrics import MetricsMiddleware
 from app.static import setup_static_files
+from app.config import settings
+import app.auth as auth
+from app.utils.image_variants import variant_pool
+from app.utils.invoice_pdf import invoice_pool
+from app.utils.invoice_batch import invoice_batch_pool
+from app.database import dispose_engines
+from app.utils.api_log_rollup import api_log_maintenance
+from app.utils.metrics import metrics_publisher
+from app.utils.token_revocation import revocation_refresher
 
 
 # Create database tables
@@ -11,6 +22,11 @@ from app.static import setup_static_files
 
 app = FastAPI()
 
+# Request metrics for /metrics. Added first so it runs inside the API logger
+# and the time spent saving log rows is not counted as request latency
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
 # Add API Logger middleware
 app.add_middleware(APILoggerMiddleware)
 
@@ -22,6 +38,39 @@ app.include_router(category_routes.router, tags=["categories"])
 app.include_router(product_routes.router, tags=["products"])
 app.include_router(product_image_routes.router, tags=["product_images"])
 app.include_router(token_routes.router, tags=["tokens"])
+app.include_router(export_routes.router, tags=["export"])
+app.include_router(invoice_routes.router, tags=["invoices"])
+app.include_router(internal_routes.router, tags=["internal"])
+
+@app.on_event("startup")
+async def start_background_tasks():
+    if settings.api_log_mode == "batched":
+        await log_writer.start()
+    if settings.api_log_maintenance:
+        await api_log_maintenance.start()
+    if settings.metrics_enabled and settings.metrics_dir:
+        await metrics_publisher.start()
+    if settings.token_sweep:
+        await auth.token_sweeper.start()
+    if settings.auth_mode == "stateless":
+        await revocation_refresher.start()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    # Flush any API logs still waiting in the queue
+    await log_writer.stop()
+    await api_log_maintenance.stop()
+    await auth.token_sweeper.stop()
+    await revocation_refresher.stop()
+    if metrics_publisher.running:
+        await metrics_publisher.stop()
+        # Publish the final counts so they stay in the totals after this worker exits
+        await metrics_publisher.run_once()
+    auth.password_hash_pool.shutdown()
+    variant_pool.shutdown()
+    invoice_pool.shutdown()
+    invoice_batch_pool.shutdown(wait=False, cancel_futures=True)
+    await dispose_engines()
 
 @app.get("/")
 def read_root():
@@ -1,116 +1,174 @@
-from fastapi import Request, Response
-from sqlalchemy.orm import Session
 from app.models.api_log import APILog
-from app.database import get_db
+from app.database import session_scope
+from app.middleware.log_writer import log_writer
+from app.config import settings
+from app.utils.routing import route_template
 import time
 import json
+from datetime import datetime
 from typing import Optional
-from starlette.middleware.base import BaseHTTPMiddleware
 from fastapi.responses import JSONResponse
 from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from starlette.concurrency import run_in_threadpool
 
 exclude_paths = ["/", "/docs", "/openapi.json","/favicon.ico"]
-class APILoggerMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-       
-        # Skip logging for root endpoint
-        if request.url.path in exclude_paths:
-            return await call_next(request)
+
+def _log_entry_values(log_entry: APILog) -> dict:
+    # Every row gets the same keys so the writer can batch them into one executemany
+    return {
+        column.name: getattr(log_entry, column.key)
+        for column in APILog.__table__.columns
+        if column.name not in ("id", "updated_at")
+    }
+
+
+class _BodyCapture:
+    """Keeps the first ``limit`` bytes of a body that is streamed through in chunks."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.size = 0
+        self._chunks = []
+        self._captured = 0
+
+    def feed(self, chunk: bytes):
+        self.size += len(chunk)
+        if self._captured < self.limit and chunk:
+            part = chunk[:self.limit - self._captured]
+            self._chunks.append(part)
+            self._captured += len(part)
+
+    @property
+    def truncated(self) -> bool:
+        return self.size > self._captured
+
+    def value(self):
+        """Return the captured body in the form stored in the JSON log columns."""
+        if self.size == 0:
+            return None
+        body = b''.join(self._chunks)
+        if self.truncated:
+            return {
+                "truncated": True,
+                "size": self.size,
+                "prefix": body.decode("utf-8", errors="replace"),
+            }
+        try:
+            return json.loads(body)
+        except Exception:
+            return str(body)
+
+
+class APILoggerMiddleware:
+    """
+    Pure ASGI middleware that logs every API call to ``api_logs``.
+
+    Request and response messages are passed straight through; only the
+    first ``max_body_bytes`` of each body are copied aside for the log, so
+    streaming responses keep streaming and large payloads are never buffered.
+    """
+
+    def __init__(self, app: ASGIApp, max_body_bytes: Optional[int] = None):
+        self.app = app
+        self.max_body_bytes = (
+            settings.api_log_max_body_bytes if max_body_bytes is None else max_body_bytes
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # Skip logging for root endpoint and docs
+        if scope["type"] != "http" or scope["path"] in exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
         # Start timing the request
         start_time = time.time()
-        
-        # Get database session
-        db: Session = next(get_db())
-        
-        # Store original request body
-        body = None
-        if request.method in ["POST", "PUT", "PATCH"]:
-            try:
-                body = await request.body()
-                # Create a new request with the same body
-                async def receive():
-                    return {"type": "http.request", "body": body}
-                request._receive = receive
-            except Exception as e:
-                print(f"Error reading request body: {str(e)}")
-
-        # Create log entry
+
+        request_headers = Headers(scope=scope)
+        client = scope.get("client")
         log_entry = APILog(
-            endpoint=request.url.path,
-            method=request.method,
-            ip_address=request.client.host,
-            user_agent=request.headers.get("user-agent"),
+            endpoint=scope["path"],
+            method=scope["method"],
+            ip_address=client[0] if client else "",
+            user_agent=request_headers.get("user-agent"),
+            request_headers=None,
+            request_body=None,
+            response_body=None,
+            created_at=datetime.now(),
         )
-        
+
         # Log request headers
         try:
-            headers_dict = dict(request.headers.items())
+            headers_dict = dict(request_headers.items())
             # Remove sensitive headers
             headers_dict.pop("authorization", None)
             headers_dict.pop("cookie", None)
             log_entry.request_headers = headers_dict
         except Exception:
             log_entry.request_headers = None
-        
-        # Log request body for POST/PUT/PATCH methods
-        if body:
-            try:
-                log_entry.request_body = json.loads(body)
-            except Exception:
-                log_entry.request_body = str(body)
-        
-        # Process the request and catch the response
+
+        # Request bodies are only logged for POST/PUT/PATCH methods
+        request_body = None
+        if scope["method"] in ["POST", "PUT", "PATCH"]:
+            request_body = _BodyCapture(self.max_body_bytes)
+        response_body = _BodyCapture(self.max_body_bytes)
+        response_started = False
+
+        async def receive_wrapper() -> Message:
+            message = await receive()
+            if request_body is not None and message["type"] == "http.request":
+                request_body.feed(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                log_entry.response_status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_body.feed(message.get("body", b""))
+            await send(message)
+
         try:
-            response = await call_next(request)
-            log_entry.response_status = response.status_code
-            
-            # Log response body
-            try:
-                response_body = []
-                async for chunk in response.body_iterator:
-                    response_body.append(chunk)
-                
-                # Combine chunks
-                full_body = b''.join(response_body)
-              
-                # Try to parse response body as JSON
-                try:
-                    log_entry.response_body = json.loads(full_body)
-                except:
-                    log_entry.response_body = str(full_body)
-                
-                # Create new response with the same body
-                return Response(
-                    content=full_body,
-                    status_code=response.status_code,
-                    headers=dict(response.headers),
-                    media_type=response.media_type
-                )
-            except Exception as e:
-                print(f"Error processing response: {str(e)}")
-                log_entry.response_body = None
-                return response
-                
+            await self.app(scope, receive_wrapper, send_wrapper)
+            log_entry.response_body = response_body.value()
         except Exception as e:
             log_entry.response_status = 500
             log_entry.response_body = {"error": str(e)}
+            # Part of the response has already gone out, let the server deal with it
+            if response_started:
+                raise
             response = JSONResponse(
                 status_code=500,
                 content={"error": "Internal server error"}
             )
-        
+            await response(scope, receive, send)
         finally:
+            if request_body is not None:
+                log_entry.request_body = request_body.value()
+
             # Calculate execution time
             log_entry.execution_time = time.time() - start_time
-            
-            # Save log entry
-            try:
-                db.add(log_entry)
-                db.commit()
-            except Exception as e:
-                print(f"Failed to save API log: {str(e)}")
-                db.rollback()
-            finally:
-                db.close()
-        
-        return response
\ No newline at end of file
+            # The router has recorded the matched endpoint in the scope by now
+            log_entry.route = route_template(scope)
+
+            await self._save(log_entry)
+
+    async def _save(self, log_entry: APILog):
+        # Hand the entry to the background writer when batching is on,
+        # otherwise save it once the response has been sent
+        if log_writer.running:
+            await log_writer.enqueue(_log_entry_values(log_entry))
+            return
+        # The insert (and any wait for a pooled connection) happens off the event loop
+        await run_in_threadpool(_save_log_entry, log_entry)
+
+
+def _save_log_entry(log_entry: APILog):
+    with session_scope() as db:
+        try:
+            db.add(log_entry)
+            db.commit()
+        except Exception as e:
+            print(f"Failed to save API log: {str(e)}")
+            db.rollback()
@@ -0,0 +1,151 @@
+import asyncio
+from typing import List, Optional
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.database import session_scope
+from app.models.api_log import APILog
+
+OVERFLOW_POLICIES = ("drop_new", "drop_oldest", "block")
+
+
+class APILogWriter:
+    """
+    Buffers API log rows in a bounded in-memory queue and writes them to
+    ``api_logs`` from a background task as multi-row inserts.
+
+    A flush happens as soon as ``batch_size`` rows are waiting, or every
+    ``flush_interval`` seconds, whichever comes first. When the queue is full,
+    ``overflow_policy`` decides what happens to the new row:
+
+    - ``drop_new``: discard the new row
+    - ``drop_oldest``: discard the oldest queued row to make room
+    - ``block``: wait up to ``block_timeout`` seconds for room, then discard
+    """
+
+    def __init__(
+        self,
+        queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        overflow_policy: str = "drop_new",
+        block_timeout: float = 0.05,
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+
+        self.queued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        """Start the background flush task on the running event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._batch_ready = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and flush everything still queued."""
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self._flush_pending()
+
+    async def enqueue(self, entry: dict) -> bool:
+        """
+        Queue a log row for the next flush.
+
+        :param entry: Column values for one ``api_logs`` row
+        :return: True if the row was queued, False if it was dropped
+        """
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            if self.overflow_policy == "drop_new":
+                self.dropped += 1
+                return False
+            if self.overflow_policy == "drop_oldest":
+                self._queue.get_nowait()
+                self.dropped += 1
+                self._queue.put_nowait(entry)
+            else:
+                try:
+                    await asyncio.wait_for(self._queue.put(entry), self.block_timeout)
+                except asyncio.TimeoutError:
+                    self.dropped += 1
+                    return False
+
+        self.queued += 1
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "overflow_policy": self.overflow_policy,
+            "queue_size": self.queue_size,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "queued": self.queued,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            await self._flush_pending()
+
+    async def _flush_pending(self):
+        while self._queue is not None and not self._queue.empty():
+            batch = []
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await run_in_threadpool(self._write_batch, batch)
+
+    def _write_batch(self, batch: List[dict]):
+        with session_scope() as db:
+            try:
+                # A list of parameter sets is sent as one executemany, which the
+                # MySQL driver rewrites into a multi-row INSERT
+                db.execute(APILog.__table__.insert(), batch)
+                db.commit()
+                self.flushed += len(batch)
+            except Exception as e:
+                print(f"Failed to save {len(batch)} API logs: {str(e)}")
+                db.rollback()
+                self.failed += len(batch)
+
+
+log_writer = APILogWriter(
+    queue_size=settings.api_log_queue_size,
+    batch_size=settings.api_log_batch_size,
+    flush_interval=settings.api_log_flush_interval,
+    overflow_policy=settings.api_log_overflow_policy,
+    block_timeout=settings.api_log_block_timeout,
+)
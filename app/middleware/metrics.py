@@ -0,0 +1,37 @@
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.utils.metrics import request_metrics
+from app.utils.routing import route_template
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware that records each request's status and latency in
+    ``request_metrics``, keyed by route template, for ``/metrics``.
+
+    Latency runs until the last body chunk has been sent, so streamed
+    responses count in full.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router has recorded the matched endpoint in the scope by now
+            request_metrics.observe(route_template(scope), scope["method"], status, time.perf_counter() - start_time)
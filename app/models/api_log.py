@@ -8,6 +8,8 @@ class APILog(Base):
     id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
     #user_id = Column(BigInteger, ForeignKey('users.id', ondelete='SET NULL'), nullable=True)
     endpoint = Column(String(255), nullable=False, index=True)
+    # Path template of the matched route (/products/{product_id}); rollups group by it
+    route = Column(String(255), nullable=True)
     method = Column(String(10), nullable=False)
     request_headers = Column(JSON, nullable=True)
     request_body = Column(JSON, nullable=True)
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Float, DateTime, UniqueConstraint
+from app.database import Base
+
+class APILogRollup(Base):
+    """Per-minute summary of api_logs for one route and method; raw rows are deleted after the retention window."""
+    __tablename__ = "api_log_rollups"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    # Start of the minute, on the same clock as api_logs.created_at
+    bucket = Column(DateTime, nullable=False)
+    route = Column(String(255), nullable=False)
+    method = Column(String(10), nullable=False)
+    request_count = Column(Integer, nullable=False)
+    # Responses with status >= 500 and 4xx
+    error_count = Column(Integer, nullable=False, default=0)
+    client_error_count = Column(Integer, nullable=False, default=0)
+    # Latencies in seconds
+    latency_avg = Column(Float, nullable=True)
+    latency_p50 = Column(Float, nullable=True)
+    latency_p90 = Column(Float, nullable=True)
+    latency_p99 = Column(Float, nullable=True)
+    latency_max = Column(Float, nullable=True)
+
+    __table_args__ = (
+        # One row per minute, route and method; also serves the time range queries of the dashboards
+        UniqueConstraint("bucket", "route", "method", name="uq_api_log_rollups_bucket_route_method"),
+    )
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, String, Text, Enum, DateTime, BigInteger
+from sqlalchemy import Column, String, Text, Enum, DateTime, BigInteger, Integer
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, literal_column
 from app.database import Base
 
 class Category(Base):
@@ -12,6 +12,8 @@ class Category(Base):
     status = Column(Enum('active', 'inactive'), default='active', index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Incremented by every UPDATE, like Product.version
+    version = Column(Integer, nullable=False, default=1, server_default="1", onupdate=literal_column("version") + 1)
 
     # Add relationship to products
     products = relationship("Product", back_populates="category") 
\ No newline at end of file
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, DateTime, BigInteger, Integer
+from sqlalchemy.sql import func
+from app.database import Base
+
+class ImageBlob(Base):
+    """One stored image file, shared by every ProductImage with the same content."""
+    __tablename__ = "image_blobs"
+
+    id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
+    sha256 = Column(String(64), nullable=False, unique=True)
+    # Path of the file relative to the uploads directory
+    path = Column(String(255), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String(100), nullable=True)
+    # Number of product_images rows pointing at this file; the file is removed when it drops to 0
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, String, Text, Enum, DateTime, BigInteger, ForeignKey, Numeric, Integer
+from sqlalchemy import Column, String, Text, Enum, DateTime, BigInteger, ForeignKey, Numeric, Integer, Index, DDL, event
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, literal_column
 from app.database import Base
 
 class Product(Base):
@@ -14,8 +14,44 @@ class Product(Base):
     price = Column(Numeric(10,2), nullable=False, default=0.00)
     stock = Column(Integer, nullable=False, default=0)
     status = Column(Enum('active', 'inactive'), default='active', index=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), index=True)
+    # Incremented by every UPDATE; conditional GET validators are built from it because
+    # updated_at has one second resolution and misses a second write within the same second
+    version = Column(Integer, nullable=False, default=1, server_default="1", onupdate=literal_column("version") + 1)
+
+    __table_args__ = (
+        # Storefront listings: active products in a category, by price or name
+        Index("ix_products_category_status_price", "category_id", "status", "price"),
+        Index("ix_products_category_status_name", "category_id", "status", "name"),
+        # Active products across categories, by price
+        Index("ix_products_status_price", "status", "price"),
+        # Backs /products/search on MySQL
+        Index("ft_products_name_sku_description", "name", "sku", "description", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
 
     category = relationship("Category", back_populates="products")
-    images = relationship("ProductImage", back_populates="product", cascade="all, delete-orphan") 
\ No newline at end of file
+    images = relationship("ProductImage", back_populates="product", cascade="all, delete-orphan")
+
+# SQLite has no FULLTEXT indexes; local and benchmark databases get an FTS5
+# table over the same columns, kept in sync by triggers so bulk statements
+# are indexed too
+_SQLITE_SEARCH_INDEX = [
+    "CREATE VIRTUAL TABLE products_fts USING fts5(name, sku, description, content='products', content_rowid='id')",
+    """CREATE TRIGGER products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, sku, description) VALUES (new.id, new.name, new.sku, new.description);
+    END""",
+    """CREATE TRIGGER products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, sku, description) VALUES ('delete', old.id, old.name, old.sku, old.description);
+    END""",
+    """CREATE TRIGGER products_fts_update AFTER UPDATE OF name, sku, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, sku, description) VALUES ('delete', old.id, old.name, old.sku, old.description);
+        INSERT INTO products_fts(rowid, name, sku, description) VALUES (new.id, new.name, new.sku, new.description);
+    END""",
+]
+for _statement in _SQLITE_SEARCH_INDEX:
+    event.listen(Product.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(
+    Product.__table__, "before_drop",
+    DDL("DROP TABLE IF EXISTS products_fts").execute_if(dialect="sqlite"),
+)
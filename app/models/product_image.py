@@ -1,6 +1,6 @@
-from sqlalchemy import Column, String, Boolean, DateTime, BigInteger, ForeignKey
+from sqlalchemy import Column, String, Boolean, DateTime, BigInteger, ForeignKey, JSON, Integer
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, literal_column
 from app.database import Base
 
 class ProductImage(Base):
@@ -9,8 +9,14 @@ class ProductImage(Base):
     id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
     product_id = Column(BigInteger, ForeignKey('products.id', ondelete='CASCADE'), index=True)
     image_path = Column(String(255), nullable=False)
+    # SHA-256 of the file contents, the key of its image_blobs row (NULL for images stored before deduplication)
+    content_hash = Column(String(64), nullable=True, index=True)
     is_primary = Column(Boolean, default=False, index=True)
+    # Rendered derivatives, variant name -> path under the uploads directory
+    variants = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Incremented by every UPDATE, like Product.version
+    version = Column(Integer, nullable=False, default=1, server_default="1", onupdate=literal_column("version") + 1)
 
     product = relationship("Product", back_populates="images") 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String,  DateTime, Integer
+from sqlalchemy import Column, String,  DateTime, Integer, Index
 from app.database import Base
 from datetime import datetime
 from sqlalchemy.sql import func
@@ -10,5 +10,15 @@ class Token(Base):
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(50), nullable=False)
     access_token = Column(String(500), nullable=False)
+    # SHA-256 hex digest of access_token; tokens are looked up by this fixed-length key
+    token_hash = Column(String(64), nullable=False)
     expires_at = Column(DateTime, nullable=False)
-    created_at = Column(DateTime, default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index("uq_tokens_token_hash", "token_hash", unique=True),
+        # Login's "valid token of this user" lookup
+        Index("ix_tokens_username_expires_at", "username", "expires_at"),
+        # The expired token sweep
+        Index("ix_tokens_expires_at", "expires_at"),
+    )
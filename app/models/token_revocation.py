@@ -0,0 +1,22 @@
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+class TokenRevocation(Base):
+    """Append-only log of revoked access tokens, read incrementally by the stateless auth mode."""
+    __tablename__ = "token_revocations"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    # Either a single token, by its jti claim...
+    jti = Column(String(32), nullable=True)
+    # ...or every token of a user whose ver claim is below token_version
+    username = Column(String(50), nullable=True)
+    token_version = Column(Integer, nullable=True)
+    # Every token this row revokes has expired by then, so the row can be deleted
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        # The expired token sweep
+        Index("ix_token_revocations_expires_at", "expires_at"),
+    )
@@ -1,15 +1,52 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
+import time
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select, func, case
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.config import settings
+from app.database import get_async_db, get_read_db
 from app.models.category import Category
-from app.schemas.category import CategoryCreate, Category as CategorySchema, CategoryBulkUpdate
+from app.models.product import Product
+from app.schemas.category import CategoryCreate, Category as CategorySchema, CategoryBulkUpdate, CategoryPage, CategorySummaryPage
 from app.utils.text_processor import encode_description
+from app.utils.pagination import keyset_page, keyset_statement, encode_cursor, MAX_PAGE_SIZE
+from app.utils.cache import TTLCache
+from app.utils.http_cache import (
+    Validators, make_validators, is_not_modified, not_modified_response, cache_headers,
+)
 
 router = APIRouter()
 
+# Category responses as (validators, serialized JSON bytes), keyed by ("list", cursor, limit) or ("detail", id)
+category_cache = TTLCache(maxsize=settings.category_cache_size, ttl=settings.category_cache_ttl)
+# Bumped on every write; a response built from a read that overlapped a write is not cached
+_cache_generation = 0
+_invalidated_at = float("-inf")
+
+def invalidate_category_cache():
+    global _cache_generation, _invalidated_at
+    _cache_generation += 1
+    _invalidated_at = time.monotonic()
+    category_cache.clear()
+
+def _can_cache(generation: int) -> bool:
+    """
+    Whether a response read while the cache was at ``generation`` may be stored
+
+    Not if a write happened in the meantime, nor, when reads may go to a
+    replica, within read_replica_max_lag seconds of the last write: the
+    replica may not have it yet, and the stale response would otherwise be
+    served for the whole category_cache_ttl.
+    """
+    if generation != _cache_generation:
+        return False
+    return not settings.read_replica_url or time.monotonic() - _invalidated_at >= settings.read_replica_max_lag
+
+def _json_response(validators: Validators, body: bytes) -> Response:
+    return Response(content=body, media_type="application/json", headers=cache_headers(validators))
+
 @router.post("/categories/", response_model=CategorySchema)
-def create_category(category: CategoryCreate, db: Session = Depends(get_db)):
+async def create_category(category: CategoryCreate, db: AsyncSession = Depends(get_async_db)):
     print(category)
     # Encode the description before saving
     category_data = category.dict()
@@ -17,62 +54,145 @@ def create_category(category: CategoryCreate, db: Session = Depends(get_db)):
     print(category_data)
     db_category = Category(**category_data)
     db.add(db_category)
-    db.commit()
-    db.refresh(db_category)
+    await db.commit()
+    invalidate_category_cache()
+    await db.refresh(db_category)
     return db_category
 
-@router.get("/categories/", response_model=List[CategorySchema])
-def read_categories(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    categories = db.query(Category).offset(skip).limit(limit).all()
-    return categories
+@router.get("/categories/", response_model=CategoryPage)
+async def read_categories(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+):
+    key = ("list", cursor, limit)
+    cached = category_cache.get(key)
+    if cached is None:
+        generation = _cache_generation
+        categories, next_cursor = await keyset_page(db, select(Category), Category.id, cursor, limit)
+        validators = make_validators(
+            "categories", cursor, limit, next_cursor, [(category.id, category.version) for category in categories]
+        )
+        if is_not_modified(request, validators):
+            return not_modified_response(validators)
+        page = CategoryPage.model_validate({"items": categories, "next_cursor": next_cursor})
+        cached = (validators, page.model_dump_json().encode())
+        if _can_cache(generation):
+            category_cache.set(key, cached)
+
+    validators, body = cached
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+    return _json_response(validators, body)
+
+def _summary_statement(cursor: Optional[str], limit: int):
+    """
+    One grouped query: a page of categories with aggregates over their products
+
+    The page of category ids is picked first (by primary key), and only the
+    products of those categories are read, through the category_id indexes.
+    """
+    page = keyset_statement(select(Category.id), Category.id, cursor).limit(limit + 1).subquery()
+    return (
+        select(
+            Category.id,
+            Category.name,
+            Category.status,
+            func.count(Product.id).label("product_count"),
+            func.coalesce(func.sum(case((Product.status == "active", 1), else_=0)), 0).label("active_product_count"),
+            func.coalesce(func.sum(case((Product.stock > 0, 1), else_=0)), 0).label("in_stock_count"),
+            func.coalesce(func.sum(Product.stock), 0).label("total_stock"),
+            func.min(Product.price).label("min_price"),
+            func.max(Product.price).label("max_price"),
+        )
+        .join(page, page.c.id == Category.id)
+        .outerjoin(Product, Product.category_id == Category.id)
+        .group_by(Category.id, Category.name, Category.status)
+        .order_by(Category.id)
+    )
+
+# Declared before /categories/{category_id} so "summary" is not parsed as an id
+@router.get("/categories/summary", response_model=CategorySummaryPage)
+async def read_category_summaries(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # Product counts change with every product write, so summaries are not kept in category_cache
+    rows = (await db.execute(_summary_statement(cursor, limit))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor({"id": rows[-1].id})
+    return {"items": [row._mapping for row in rows], "next_cursor": next_cursor}
 
 @router.get("/categories/{category_id}", response_model=CategorySchema)
-def read_category(category_id: int, db: Session = Depends(get_db)):
-    category = db.query(Category).filter(Category.id == category_id).first()
-    if category is None:
-        raise HTTPException(status_code=404, detail="Category not found")
-    return category
+async def read_category(category_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    key = ("detail", category_id)
+    cached = category_cache.get(key)
+    if cached is None:
+        generation = _cache_generation
+        category = await db.get(Category, category_id)
+        if category is None:
+            raise HTTPException(status_code=404, detail="Category not found")
+        validators = make_validators("category", category.id, category.version)
+        if is_not_modified(request, validators):
+            return not_modified_response(validators)
+        cached = (validators, CategorySchema.model_validate(category).model_dump_json().encode())
+        if _can_cache(generation):
+            category_cache.set(key, cached)
 
-@router.put("/categories/{category_id}", response_model=CategorySchema)
-def update_category(category_id: int, category: CategoryCreate, db: Session = Depends(get_db)):
-    db_category = db.query(Category).filter(Category.id == category_id).first()
-    if db_category is None:
-        raise HTTPException(status_code=404, detail="Category not found")
-    
-    # Encode the description before updating
-    update_data = category.dict(exclude_unset=True)
-   # update_data['description'] = encode_description(update_data.get('description'))
-    
-    for key, value in update_data.items():
-        setattr(db_category, key, value)
-    
-    db.commit()
-    db.refresh(db_category)
-    return db_category
+    validators, body = cached
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+    return _json_response(validators, body)
 
+# Declared before PUT /categories/{category_id} so "bulk" is not parsed as an id
 @router.put("/categories/bulk", response_model=List[CategorySchema])
-def bulk_update_categories(categories: List[CategoryBulkUpdate], db: Session = Depends(get_db)):
+async def bulk_update_categories(categories: List[CategoryBulkUpdate], db: AsyncSession = Depends(get_async_db)):
     updated_categories = []
     
     for category_update in categories:
-        db_category = db.query(Category).filter(Category.id == category_update.id).first()
+        db_category = await db.get(Category, category_update.id)
         if db_category is None:
             raise HTTPException(
                 status_code=404, 
                 detail=f"Category with id {category_update.id} not found"
             )
         
-        # Encode the description before updating
-        update_data = category_update.dict(exclude={'id'})
-        update_data['description'] = encode_description(update_data.get('description'))
+        # Only the fields sent in the request are changed
+        update_data = category_update.dict(exclude={'id'}, exclude_unset=True)
+        if 'description' in update_data:
+            # Encode the description before updating
+            update_data['description'] = encode_description(update_data['description'])
         
         for key, value in update_data.items():
             setattr(db_category, key, value)
         
         updated_categories.append(db_category)
     
-    db.commit()
+    await db.commit()
+    invalidate_category_cache()
     for category in updated_categories:
-        db.refresh(category)
+        await db.refresh(category)
+    
+    return updated_categories
+
+@router.put("/categories/{category_id}", response_model=CategorySchema)
+async def update_category(category_id: int, category: CategoryCreate, db: AsyncSession = Depends(get_async_db)):
+    db_category = await db.get(Category, category_id)
+    if db_category is None:
+        raise HTTPException(status_code=404, detail="Category not found")
     
-    return updated_categories 
\ No newline at end of file
+    # Encode the description before updating
+    update_data = category.dict(exclude_unset=True)
+   # update_data['description'] = encode_description(update_data.get('description'))
+    
+    for key, value in update_data.items():
+        setattr(db_category, key, value)
+    
+    await db.commit()
+    invalidate_category_cache()
+    await db.refresh(db_category)
+    return db_category
@@ -0,0 +1,139 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from typing import Annotated, Iterator, List
+from datetime import datetime
+from decimal import Decimal
+import csv
+import io
+import json
+from app.database import session_scope
+from app.models.category import Category
+from app.models.product import Product
+from app.models.product_image import ProductImage
+from app.schemas.user import User as UserSchema
+import app.auth as auth
+
+router = APIRouter()
+
+# Rows fetched from the server-side cursor and written out per chunk
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+PRODUCT_INCLUDES = {"category", "primary_image"}
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def _stream_rows(statement, export_format: str) -> Iterator[str]:
+    """
+    Run ``statement`` on a server-side cursor and yield it as NDJSON or CSV text,
+    one chunk of EXPORT_CHUNK_SIZE rows at a time.
+    """
+    # The generator outlives the request handler, so it owns its session
+    with session_scope() as db:
+        result = db.execute(
+            statement.execution_options(stream_results=True, yield_per=EXPORT_CHUNK_SIZE)
+        )
+        columns = list(result.keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if export_format == "csv":
+            writer.writerow(columns)
+            yield buffer.getvalue()
+
+        for rows in result.partitions():
+            buffer.seek(0)
+            buffer.truncate()
+            if export_format == "csv":
+                writer.writerows([_csv_value(value) for value in row] for row in rows)
+            else:
+                for row in rows:
+                    buffer.write(json.dumps(dict(zip(columns, row)), default=_json_default))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+
+def _export_response(statement, export_format: str, name: str) -> StreamingResponse:
+    return StreamingResponse(
+        _stream_rows(statement, export_format),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{export_format}"'},
+    )
+
+def _parse_includes(include: str) -> List[str]:
+    includes = [part.strip() for part in include.split(",") if part.strip()]
+    unknown = set(includes) - PRODUCT_INCLUDES
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown include value(s): {', '.join(sorted(unknown))}"
+        )
+    return includes
+
+
+@router.get("/export/products")
+def export_products(
+    current_user: Annotated[UserSchema, Depends(auth.get_current_active_user)],
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    include: str = Query("", description="Comma separated: category, primary_image"),
+):
+    """Stream every product as NDJSON or CSV, optionally with its category name and primary image path."""
+    includes = _parse_includes(include)
+
+    statement = select(
+        Product.id,
+        Product.category_id,
+        Product.name,
+        Product.sku,
+        Product.description,
+        Product.price,
+        Product.stock,
+        Product.status,
+        Product.created_at,
+        Product.updated_at,
+    )
+    if "category" in includes:
+        statement = statement.add_columns(Category.name.label("category_name")).outerjoin(
+            Category, Category.id == Product.category_id
+        )
+    if "primary_image" in includes:
+        # A product may have more than one image flagged primary; take the oldest
+        primary_image = (
+            select(ProductImage.image_path)
+            .where(ProductImage.product_id == Product.id, ProductImage.is_primary == True)
+            .order_by(ProductImage.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        statement = statement.add_columns(primary_image.label("primary_image_path"))
+
+    return _export_response(statement.order_by(Product.id), format, "products")
+
+@router.get("/export/categories")
+def export_categories(
+    current_user: Annotated[UserSchema, Depends(auth.get_current_active_user)],
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+):
+    """Stream every category as NDJSON or CSV."""
+    statement = select(
+        Category.id,
+        Category.name,
+        Category.description,
+        Category.status,
+        Category.created_at,
+        Category.updated_at,
+    ).order_by(Category.id)
+    return _export_response(statement, format, "categories")
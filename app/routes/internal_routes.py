@@ -0,0 +1,126 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.middleware.log_writer import log_writer
+import app.auth as auth
+from app.database import pool_stats, get_read_db
+from app.models.api_log_rollup import APILogRollup
+from app.utils.api_log_rollup import api_log_maintenance
+from app.routes.category_routes import category_cache
+from app.static import hot_file_cache
+from app.utils.invoice_pdf import invoice_pool
+from app.utils.invoice_batch import batch_tracker
+from app.utils.metrics import request_metrics
+from app.utils.token_revocation import revocation_filter, revocation_refresher
+
+router = APIRouter()
+
+class PrometheusResponse(PlainTextResponse):
+    media_type = "text/plain; version=0.0.4"
+
+@router.get("/metrics", response_class=PrometheusResponse)
+def read_metrics():
+    """Request counts and latency histograms per route template, summed over all workers, for Prometheus."""
+    return request_metrics.render()
+
+@router.get("/internal/api-log-writer")
+def read_api_log_writer_stats():
+    """Queue depth and queued/flushed/dropped counters of the batched API log writer."""
+    return log_writer.stats()
+
+@router.get("/internal/api-log-maintenance")
+def read_api_log_maintenance_stats():
+    """Runs, failures and rows rolled up / deleted on the last run of the api_logs rollup and retention job."""
+    return api_log_maintenance.stats()
+
+@router.get("/internal/api-stats")
+async def read_api_stats(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    route: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Request, error and latency figures from the api_logs rollups (the last hour by default)
+
+    Without ``route``: one summary per route and method. With ``route``: its
+    per-minute series. Percentiles cannot be merged across minutes, so
+    summaries report the average latency and the worst minute's p99.
+    """
+    until = until or datetime.now()
+    since = since or until - timedelta(hours=1)
+    in_range = [APILogRollup.bucket >= since, APILogRollup.bucket < until]
+    if route is not None:
+        rows = await db.execute(
+            select(APILogRollup).where(*in_range, APILogRollup.route == route).order_by(APILogRollup.bucket)
+        )
+        return [
+            {column.name: getattr(rollup, column.key) for column in APILogRollup.__table__.columns if column.name != "id"}
+            for rollup in rows.scalars()
+        ]
+
+    requests = func.sum(APILogRollup.request_count)
+    rows = await db.execute(
+        select(
+            APILogRollup.route,
+            APILogRollup.method,
+            requests.label("request_count"),
+            func.sum(APILogRollup.error_count).label("error_count"),
+            func.sum(APILogRollup.client_error_count).label("client_error_count"),
+            (func.sum(APILogRollup.latency_avg * APILogRollup.request_count) / requests).label("latency_avg"),
+            func.max(APILogRollup.latency_p99).label("latency_p99_max"),
+            func.max(APILogRollup.latency_max).label("latency_max"),
+        )
+        .where(*in_range)
+        .group_by(APILogRollup.route, APILogRollup.method)
+        .order_by(requests.desc())
+    )
+    return [dict(row._mapping) for row in rows]
+
+@router.get("/internal/auth-cache")
+def read_auth_cache_stats():
+    """Hit/miss/eviction counters of the validated access token cache."""
+    return auth.auth_cache.stats()
+
+@router.get("/internal/token-sweeper")
+def read_token_sweeper_stats():
+    """Runs, failures and tokens deleted on the last run of the expired token sweep."""
+    return auth.token_sweeper.stats()
+
+@router.get("/internal/token-revocations")
+def read_token_revocation_stats():
+    """Size and freshness of the in-memory revocation filter used by the stateless auth mode."""
+    return {**revocation_filter.stats(), "refresher": revocation_refresher.stats()}
+
+@router.get("/internal/category-cache")
+def read_category_cache_stats():
+    """Hit ratio, eviction and expiration counters of the category response cache."""
+    return category_cache.stats()
+
+@router.get("/internal/uploads-cache")
+def read_uploads_cache_stats():
+    """Size in bytes, hit ratio and evictions of the in-memory cache of small upload files."""
+    return hot_file_cache.stats()
+
+@router.get("/internal/password-hash-pool")
+def read_password_hash_pool_stats():
+    """In-flight, completed, failed, cancelled and rejected calls of the bcrypt worker pool."""
+    return auth.password_hash_pool.stats()
+
+@router.get("/internal/invoice-pool")
+def read_invoice_pool_stats():
+    """In-flight, completed, failed, cancelled and rejected renders of the PDF invoice worker pool."""
+    return invoice_pool.stats()
+
+@router.get("/internal/invoice-batches")
+def read_invoice_batch_stats():
+    """Progress (rendered/failed/total) of the invoice batches running in this worker."""
+    return batch_tracker.stats()
+
+@router.get("/internal/db-pool")
+def read_db_pool_stats():
+    """Connection pool usage: checked out, overflow, checkout wait times and connections created."""
+    return pool_stats()
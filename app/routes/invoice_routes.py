@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Body, Depends, Response
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+from typing import Annotated, AsyncIterator, List
+from app.config import settings
+from app.schemas.invoice import InvoiceCreate
+from app.schemas.user import User as UserSchema
+from app.utils.invoice_pdf import invoice_pool, render_invoice, pdf_filename
+from app.utils.invoice_batch import InvoiceZip, batch_tracker, invoice_batch_pool, render_invoices_async
+import app.auth as auth
+
+router = APIRouter()
+
+# Endpoint to render an invoice as PDF; the document is built in memory and never written to disk
+@router.post("/invoices/pdf", response_class=Response, responses={200: {"content": {"application/pdf": {}}}})
+async def render_invoice_pdf(
+    invoice: InvoiceCreate,
+    current_user: Annotated[UserSchema, Depends(auth.get_current_active_user)],
+):
+    pdf = await invoice_pool.run(render_invoice, invoice.model_dump(exclude_none=True))
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f'inline; filename="{pdf_filename(invoice.invoice_number)}"',
+            "Cache-Control": "no-store",
+        },
+    )
+
+async def _zip_stream(specs: List[dict], batch_id: int) -> AsyncIterator[bytes]:
+    archive = InvoiceZip(progress=batch_tracker.progress(batch_id), total=len(specs))
+    async for result in render_invoices_async(
+        specs, invoice_batch_pool, settings.invoice_batch_chunk_size, 2 * settings.invoice_batch_workers
+    ):
+        archive.add(result)
+        data = archive.take()
+        if data:
+            yield data
+    archive.close()
+    yield archive.take()
+
+class _BatchResponse(StreamingResponse):
+    """
+    Releases the batch slot once the response is over, however it ends
+
+    The generator's own cleanup never runs if the client is gone before the
+    first chunk is requested, so the slot is released around the whole response.
+    """
+
+    def __init__(self, content, batch_id: int, **kwargs):
+        super().__init__(content, **kwargs)
+        self.batch_id = batch_id
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            batch_tracker.finish(self.batch_id)
+
+# Endpoint to render a batch of invoices into a ZIP archive, streamed as invoices complete
+@router.post("/invoices/batch", response_class=StreamingResponse, responses={200: {"content": {"application/zip": {}}}})
+async def render_invoice_batch(
+    invoices: Annotated[List[InvoiceCreate], Body(min_length=1, max_length=settings.invoice_batch_max_invoices)],
+    current_user: Annotated[UserSchema, Depends(auth.get_current_active_user)],
+):
+    """
+    Render every invoice into one ZIP of PDFs
+
+    Invoices that fail to render are left out of the archive and listed, with
+    their index and error, in its last entry, manifest.json. Progress of
+    running batches is served at /internal/invoice-batches.
+    """
+    batch_id = batch_tracker.start(len(invoices))
+    specs = [invoice.model_dump(exclude_none=True) for invoice in invoices]
+    return _BatchResponse(
+        _zip_stream(specs, batch_id),
+        batch_id,
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="invoices.zip"', "Cache-Control": "no-store"},
+    )
@@ -1,125 +1,147 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import FileResponse
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from typing import List
 import os
-import shutil
-from datetime import datetime
-from app.database import get_db
+from app.database import get_async_db, get_read_db
 from app.models.product_image import ProductImage
-from app.schemas.product_image import ProductImageCreate, ProductImage as ProductImageSchema
+from app.schemas.product_image import ProductImage as ProductImageSchema
 from app.models.product import Product
+from app.utils import image_store, image_variants
+from app.utils.image_store import UPLOAD_DIR
 
 router = APIRouter()
 
 # Create uploads directory if it doesn't exist
-UPLOAD_DIR = "uploads"
 if not os.path.exists(UPLOAD_DIR):
     os.makedirs(UPLOAD_DIR)
 
+async def _undo_image_record(db: AsyncSession, db_image: ProductImage):
+    """Delete a committed image whose file could not be stored, so no row points at a missing file."""
+    try:
+        unreferenced = await image_store.release_references(db, [db_image.content_hash])
+        await db.delete(db_image)
+        await db.commit()
+        await image_store.remove_unreferenced_files(db, unreferenced)
+    except Exception as e:
+        await db.rollback()
+        print(f"Failed to remove image record {db_image.id} after its file could not be stored: {str(e)}")
+
 @router.post("/products/{product_id}/images/", response_model=ProductImageSchema)
 async def create_product_image(
     product_id: int,
-    image: ProductImageCreate,
+    background_tasks: BackgroundTasks,
+    is_primary: bool = Form(False),
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Check if product exists
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
     # Validate file type
-    if not file.content_type.startswith('image/'):
+    if not file.content_type or not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File must be an image")
-    
-    # Create unique filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    #get the file extension eg .jpg, .png, .jpeg
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"product_{product_id}_{timestamp}{file_extension}"
-    
-    # Create year/month based directory structure
-    year_month = datetime.now().strftime("%Y/%m")
-    upload_path = os.path.join(UPLOAD_DIR, year_month)
-    if not os.path.exists(upload_path):
-        os.makedirs(upload_path)
-    
-    # Full path for the file
-    file_path = os.path.join(upload_path, unique_filename)
-    
-    try:
-        # Save the file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save image: {str(e)}")
-    
-    # Create database record
-    relative_path = os.path.join(year_month, unique_filename)
-    db_image = ProductImage(
-        product_id=product_id,
-        image_path=relative_path,
-        is_primary=image.is_primary  # Set to True if it's the first image
-    )
-    
-    # Check if this is the first image for the product
-    #existing_images = db.query(ProductImage).filter(
-    #    ProductImage.product_id == product_id
-    #).count()
-    #if existing_images == 0:
-    #    db_image.is_primary = True
-    
+
+    # Copy and hash the upload in chunks off the event loop
+    upload = await image_store.spool_upload(file)
     try:
-        db.add(db_image)
-        db.commit()
-        db.refresh(db_image)
-    except Exception as e:
-        # Remove uploaded file if database operation fails
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Failed to create image record: {str(e)}")
-    
+        try:
+            # Files are stored once per content hash; identical images share the file
+            blob = await image_store.add_reference(db, upload, file.filename, file.content_type)
+            db_image = ProductImage(
+                product_id=product_id,
+                image_path=blob.path,
+                content_hash=blob.sha256,
+                is_primary=is_primary
+            )
+            db.add(db_image)
+            # Loaded before committing, so nothing can fail between the commit and storing the file
+            await db.flush()
+            await db.refresh(db_image)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            raise HTTPException(status_code=500, detail=f"Failed to create image record: {str(e)}")
+
+        # Only once the reference is committed, so a failed commit leaves no orphaned file
+        try:
+            await run_in_threadpool(image_store.move_into_place, upload, blob.path)
+        except Exception as e:
+            await _undo_image_record(db, db_image)
+            raise HTTPException(status_code=500, detail=f"Failed to store image file: {str(e)}")
+    finally:
+        await run_in_threadpool(image_store.discard, upload)
+
+    # Render thumbnails once the response has been sent
+    background_tasks.add_task(image_variants.generate_variants, db_image.id)
     return db_image
 
 @router.get("/products/{product_id}/images/", response_model=List[ProductImageSchema])
-def read_product_images(product_id: int, db: Session = Depends(get_db)):
-    images = db.query(ProductImage).filter(ProductImage.product_id == product_id).all()
+async def read_product_images(product_id: int, db: AsyncSession = Depends(get_read_db)):
+    images = (await db.scalars(select(ProductImage).where(ProductImage.product_id == product_id))).all()
     return images
 
+@router.get("/products/images/{image_id}/variants/{variant}")
+async def read_product_image_variant(image_id: int, variant: str, db: AsyncSession = Depends(get_async_db)):
+    """Serve a resized variant of an image, rendering it on first request if it does not exist yet."""
+    db_image = await db.get(ProductImage, image_id)
+    if db_image is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    path = await image_variants.ensure_variant(db_image, variant)
+    if (db_image.variants or {}).get(variant) != path:
+        db_image.variants = {**(db_image.variants or {}), variant: path}
+        await db.commit()
+    return FileResponse(
+        os.path.join(UPLOAD_DIR, path),
+        media_type=f"image/{image_variants.VARIANT_FORMAT}",
+        # The path is derived from the image content, so it never changes
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
+
 @router.delete("/products/images/{image_id}")
-def delete_product_image(image_id: int, db: Session = Depends(get_db)):
-    db_image = db.query(ProductImage).filter(ProductImage.id == image_id).first()
+async def delete_product_image(image_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_image = await db.get(ProductImage, image_id)
     if db_image is None:
         raise HTTPException(status_code=404, detail="Image not found")
     
-    # Delete the physical file
-    file_path = os.path.join(UPLOAD_DIR, db_image.image_path)
-    if os.path.exists(file_path):
-        try:
-            os.remove(file_path)
-        except Exception as e:
-            print(f"Failed to delete file {file_path}: {str(e)}")
-    
-    # Delete database record
-    db.delete(db_image)
-    db.commit()
+    if db_image.content_hash is None:
+        # Images stored before deduplication own their file and variants
+        file_path = os.path.join(UPLOAD_DIR, db_image.image_path)
+        if os.path.exists(file_path):
+            try:
+                os.remove(file_path)
+            except Exception as e:
+                print(f"Failed to delete file {file_path}: {str(e)}")
+        await run_in_threadpool(image_store.remove_variants, image_store.content_key(db_image))
+
+    # Delete database record; the shared file goes once its last reference is gone
+    unreferenced = await image_store.release_references(db, [db_image.content_hash])
+    await db.delete(db_image)
+    await db.commit()
+    await image_store.remove_unreferenced_files(db, unreferenced)
     
     return {"message": "Image deleted successfully"}
 
 @router.put("/products/images/{image_id}/set-primary", response_model=ProductImageSchema)
-def set_primary_image(image_id: int, db: Session = Depends(get_db)):
-    db_image = db.query(ProductImage).filter(ProductImage.id == image_id).first()
+async def set_primary_image(image_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_image = await db.get(ProductImage, image_id)
     if db_image is None:
         raise HTTPException(status_code=404, detail="Image not found")
     
     # Reset all images for this product to non-primary
-    db.query(ProductImage).filter(
-        ProductImage.product_id == db_image.product_id
-    ).update({"is_primary": False})
+    await db.execute(
+        update(ProductImage)
+        .where(ProductImage.product_id == db_image.product_id)
+        .values(is_primary=False)
+    )
     
     # Set the selected image as primary
     db_image.is_primary = True
-    db.commit()
-    db.refresh(db_image)
+    await db.commit()
+    await db.refresh(db_image)
     return db_image 
\ No newline at end of file
@@ -1,28 +1,46 @@
 # Import required FastAPI components
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 # Import SQLAlchemy session management
-from sqlalchemy.orm import Session
-# Import for raw SQL queries
-from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload, joinedload
+# Import SQL expression builders for set-based bulk statements
+from sqlalchemy import select, insert, update, func, or_
+from sqlalchemy.dialects import mysql, sqlite
 # Import typing for type hints
-from typing import List
+from typing import List, Literal, Optional
+from datetime import datetime, timezone
+from decimal import Decimal
 # Import database connection utility
-from app.database import get_db
+from app.database import get_async_db, get_read_db
 # Import Product model
 from app.models.product import Product
+from app.models.category import Category
 # Import Product-related schemas
-from app.schemas.product import ProductCreate, ProductUpdate, Product as ProductSchema, ProductBulkUpdate
+from app.schemas.product import (
+    ProductCreate, ProductUpdate, Product as ProductSchema, ProductBulkUpdate, ProductPage,
+    ProductBulkResult, BulkItemError, ProductExpanded, ProductExpandedPage,
+)
+from app.schemas.category import Category as CategorySchema
+from app.schemas.product_image import ProductImage as ProductImageSchema
 # Import text processor utility
 from app.utils.text_processor import encode_description
+# Import keyset pagination helpers
+from app.utils.pagination import keyset_page, keyset_page_version, MAX_PAGE_SIZE
+# Import conditional GET helpers
+from app.utils.http_cache import make_validators, is_not_modified, not_modified_response, cache_headers
+# Import full-text search helpers
+from app.utils.search import search_page, MAX_QUERY_LENGTH
+# Import content-addressed image storage
+from app.utils import image_store
 # Create API router instance
 import app.auth as auth
 from typing import Annotated
-from app.models.user import User as UserModel
+from app.schemas.user import User as UserSchema
 router = APIRouter()
 
 # Endpoint to create a single product
 @router.post("/products/", response_model=ProductSchema)
-def create_product(product: ProductCreate, db: Session = Depends(get_db)):
+async def create_product(product: ProductCreate, db: AsyncSession = Depends(get_async_db)):
     # Encode the description before saving
     product_data = product.model_dump()
     product_data['description'] = encode_description(product_data.get('description'))
@@ -33,63 +51,326 @@ def create_product(product: ProductCreate, db: Session = Depends(get_db)):
     db.add(db_product)
     # Commit the transaction
     try:
-        db.commit()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(e)
         raise HTTPException(status_code=500, detail="Failed to create product")
     # Refresh the product instance to get updated data (like id)
-    db.refresh(db_product)
+    await db.refresh(db_product)
     return db_product
 
-# Endpoint to create multiple products in one request
-@router.post("/products/bulk", response_model=List[ProductSchema])
-def bulk_create_products(products: List[ProductCreate], db: Session = Depends(get_db)):
-    db_products = []
+async def _find_bulk_errors(db: AsyncSession, rows: List[dict], mode: str) -> dict:
+    """
+    Check a bulk payload with one IN query per referenced table instead of one
+    query per item. Returns {index: error detail} for the rows that must be skipped.
+    """
+    errors = {}
+
+    # Duplicate ids / SKUs inside the batch itself
+    seen_ids = set()
+    seen_skus = set()
+    for index, row in enumerate(rows):
+        if mode == "update":
+            if row["id"] in seen_ids:
+                errors[index] = f"Product with id {row['id']} appears more than once"
+                continue
+            seen_ids.add(row["id"])
+        if row.get("sku") is not None:
+            if row["sku"] in seen_skus:
+                errors[index] = f"SKU {row['sku']} appears more than once"
+                continue
+            seen_skus.add(row["sku"])
+
+    if mode == "update" and seen_ids:
+        existing_ids = set(await db.scalars(select(Product.id).where(Product.id.in_(seen_ids))))
+        for index, row in enumerate(rows):
+            if index not in errors and row["id"] not in existing_ids:
+                errors[index] = f"Product with id {row['id']} not found"
+
+    category_ids = {row["category_id"] for row in rows if row.get("category_id") is not None}
+    if category_ids:
+        existing_categories = set(await db.scalars(select(Category.id).where(Category.id.in_(category_ids))))
+        for index, row in enumerate(rows):
+            if index in errors or row.get("category_id") is None:
+                continue
+            if row["category_id"] not in existing_categories:
+                errors[index] = f"Category with id {row['category_id']} not found"
+
+    # Upserts are allowed to hit existing SKUs, creates and updates are not
+    if mode != "upsert" and seen_skus:
+        sku_owners = dict((await db.execute(select(Product.sku, Product.id).where(Product.sku.in_(seen_skus)))).all())
+        for index, row in enumerate(rows):
+            if index in errors or row.get("sku") not in sku_owners:
+                continue
+            if sku_owners[row["sku"]] != row.get("id"):
+                errors[index] = f"SKU {row['sku']} already exists"
+
+    return errors
+
+def _upsert_statement(db: AsyncSession, columns: List[str]):
+    # INSERT ... ON DUPLICATE KEY UPDATE keyed on the unique sku column; column
+    # onupdate values are not applied to the update half, so they are set here
+    update_columns = [column for column in columns if column != "sku"]
+    bumped = {"updated_at": func.now(), "version": Product.version + 1}
+    if db.bind.dialect.name == "sqlite":
+        statement = sqlite.insert(Product)
+        return statement.on_conflict_do_update(
+            index_elements=[Product.sku],
+            set_={**{column: statement.excluded[column] for column in update_columns}, **bumped},
+        )
+    statement = mysql.insert(Product)
+    return statement.on_duplicate_key_update(
+        {**{column: statement.inserted[column] for column in update_columns}, **bumped}
+    )
+
+async def _bulk_result(db: AsyncSession, rows: List[dict], errors: dict, key: str) -> dict:
+    # Read back every written row with a single IN query, in request order
+    keys = [row[key] for index, row in enumerate(rows) if index not in errors]
+    products = {}
+    if keys:
+        column = getattr(Product, key)
+        products = {getattr(product, key): product for product in await db.scalars(
+            # Rows may already be in the session from before the write
+            select(Product).where(column.in_(keys)).execution_options(populate_existing=True)
+        )}
+    return {
+        "items": [products[value] for value in keys if value in products],
+        "errors": [
+            BulkItemError(index=index, id=rows[index].get("id"), sku=rows[index].get("sku"), detail=detail)
+            for index, detail in sorted(errors.items())
+        ],
+    }
+
+# Endpoint to create (or upsert by SKU) multiple products in one request
+@router.post("/products/bulk", response_model=ProductBulkResult)
+async def bulk_create_products(
+    products: List[ProductCreate],
+    mode: str = Query("create", pattern="^(create|upsert)$"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    rows = []
     for product in products:
         # Encode the description before saving
         product_data = product.model_dump()
         product_data['description'] = encode_description(product_data.get('description'))
-        db_product = Product(**product_data)
-        db_products.append(db_product)
-    
-    # Add all products to database session
-    db.add_all(db_products)
-    # Commit the transaction
-    db.commit()
-    # Refresh all product instances
-    for product in db_products:
-        db.refresh(product)
-    return db_products
-
-# Endpoint to get list of products with pagination
-@router.get("/products/", response_model=List[ProductSchema])
-def read_products(current_user: Annotated[UserModel, Depends(auth.get_current_active_user)],skip: int = 0, limit: int = 100,  db: Session = Depends(get_db))->List[ProductSchema]:
-    # Example of raw SQL query (commented out ORM version)
-    #products = db.query(Product).offset(skip).limit(limit).all()
-    # Execute raw SQL query
-    products = db.execute(text("SELECT * FROM products"))
-    # Convert result to dictionary format
-    products = products.mappings().all()
-    # Debug print
-    #print(products)
-    return products
+        rows.append(product_data)
+
+    # Invalid rows are reported per item instead of failing the whole batch
+    errors = await _find_bulk_errors(db, rows, mode)
+    valid_rows = [row for index, row in enumerate(rows) if index not in errors]
+
+    if valid_rows:
+        if mode == "upsert":
+            statement = _upsert_statement(db, list(valid_rows[0].keys()))
+        else:
+            statement = insert(Product)
+        try:
+            # A list of parameter sets runs as a single executemany
+            await db.execute(statement, valid_rows)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            print(e)
+            raise HTTPException(status_code=500, detail="Failed to create products")
+
+    return await _bulk_result(db, rows, errors, "sku")
+
+# Endpoint to update multiple products in one request
+# Declared before /products/{product_id} so "bulk" is not taken for a product id
+@router.put("/products/bulk", response_model=ProductBulkResult)
+async def bulk_update_products(products: List[ProductBulkUpdate], db: AsyncSession = Depends(get_async_db)):
+    rows = []
+    for product_update in products:
+        # Encode the description before updating
+        update_data = product_update.model_dump()
+        if 'description' in update_data:
+            update_data['description'] = encode_description(update_data['description'])
+        rows.append(update_data)
+
+    # Resolve all target ids with one IN query and report the bad ones per item
+    errors = await _find_bulk_errors(db, rows, "update")
+    valid_rows = [row for index, row in enumerate(rows) if index not in errors]
+
+    if valid_rows:
+        try:
+            # ORM bulk UPDATE by primary key, sent as a single executemany
+            await db.execute(update(Product), valid_rows)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            print(e)
+            raise HTTPException(status_code=500, detail="Failed to update products")
+
+    return await _bulk_result(db, rows, errors, "id")
+
+# Sort keys accepted by GET /products/; a leading "-" sorts descending
+PRODUCT_SORT_KEYS = {
+    "id": Product.id,
+    "price": Product.price,
+    "name": Product.name,
+    "created_at": Product.created_at,
+}
+ProductSort = Literal["id", "-id", "price", "-price", "name", "-name", "created_at", "-created_at"]
+
+def _product_filters(
+    category_id: Optional[int],
+    status: Optional[str],
+    min_price: Optional[Decimal],
+    max_price: Optional[Decimal],
+    in_stock: Optional[bool],
+    updated_since: Optional[datetime],
+) -> list:
+    criteria = []
+    if category_id is not None:
+        criteria.append(Product.category_id == category_id)
+    if status is not None:
+        criteria.append(Product.status == status)
+    if min_price is not None:
+        criteria.append(Product.price >= min_price)
+    if max_price is not None:
+        criteria.append(Product.price <= max_price)
+    if in_stock is not None:
+        criteria.append(Product.stock > 0 if in_stock else Product.stock <= 0)
+    if updated_since is not None:
+        if updated_since.tzinfo is not None:
+            # Timestamps are stored as naive UTC
+            updated_since = updated_since.astimezone(timezone.utc).replace(tzinfo=None)
+        # New products only have created_at set; each side can use its own index
+        criteria.append(or_(Product.updated_at >= updated_since, Product.created_at >= updated_since))
+    return criteria
+
+# Relations that ?expand= can include, and how each is loaded: the category
+# joined into the product query, the images with one extra query per page
+PRODUCT_EXPANSIONS = {
+    "category": lambda: joinedload(Product.category),
+    "images": lambda: selectinload(Product.images),
+}
+
+def _parse_expand(expand: Optional[str]) -> List[str]:
+    names = sorted({name.strip() for name in (expand or "").split(",") if name.strip()})
+    unknown = [name for name in names if name not in PRODUCT_EXPANSIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot expand {', '.join(unknown)}; expected {', '.join(PRODUCT_EXPANSIONS)}",
+        )
+    return names
+
+def _expand_options(names: List[str]) -> list:
+    return [PRODUCT_EXPANSIONS[name]() for name in names]
+
+def _expanded_versions(product, names: List[str]) -> list:
+    # Versions of the product and of the related rows included with it, for the response validators
+    versions = [("product", product.id, product.version)]
+    if "category" in names and product.category is not None:
+        versions.append(("category", product.category.id, product.category.version))
+    if "images" in names:
+        versions.extend(("image", image.id, image.version) for image in product.images)
+    return versions
+
+def _expanded_product(product, names: List[str]) -> dict:
+    # Relations are serialized here, from what was eager loaded; the response
+    # model leaves out the ones that were not requested
+    data = ProductSchema.model_validate(product).model_dump()
+    if "category" in names:
+        data["category"] = CategorySchema.model_validate(product.category).model_dump() if product.category else None
+    if "images" in names:
+        data["images"] = [ProductImageSchema.model_validate(image).model_dump() for image in product.images]
+    return data
+
+# Endpoint to get list of products with filters, sorting and keyset pagination
+@router.get("/products/", response_model=ProductExpandedPage, response_model_exclude_unset=True)
+async def read_products(
+    current_user: Annotated[UserSchema, Depends(auth.get_current_active_user)],
+    request: Request,
+    response: Response,
+    category_id: Optional[int] = None,
+    status: Optional[Literal["active", "inactive"]] = None,
+    min_price: Optional[Decimal] = Query(None, ge=0),
+    max_price: Optional[Decimal] = Query(None, ge=0),
+    in_stock: Optional[bool] = None,
+    updated_since: Optional[datetime] = None,
+    sort: ProductSort = "id",
+    expand: Optional[str] = Query(None, description="Comma-separated relations to include: category, images"),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+):
+    expand_names = _parse_expand(expand)
+    statement = select(Product).where(
+        *_product_filters(category_id, status, min_price, max_price, in_stock, updated_since)
+    )
+    descending = sort.startswith("-")
+    sort_column = PRODUCT_SORT_KEYS[sort.lstrip("-")]
+    # Sorting by id needs no separate sort value in the cursor
+    ordering = dict(sort_column=None if sort_column is Product.id else sort_column, descending=descending)
+
+    if expand_names:
+        # Related rows can change without touching the products, so the page is
+        # loaded (in a fixed number of queries) before its validators are known
+        products, next_cursor = await keyset_page(
+            db, statement.options(*_expand_options(expand_names)), Product.id, cursor, limit, **ordering
+        )
+        versions = [version for product in products for version in _expanded_versions(product, expand_names)]
+        validators = make_validators("products", sorted(request.query_params.multi_items()), versions)
+        if is_not_modified(request, validators):
+            return not_modified_response(validators, private=True)
+    else:
+        # Validators come from an aggregate over the ids and versions of the page,
+        # so an unchanged page is answered with 304 before any product is loaded
+        version = await keyset_page_version(
+            db, statement, Product.id, Product.version, cursor, limit, **ordering
+        )
+        validators = make_validators("products", sorted(request.query_params.multi_items()), *version)
+        if is_not_modified(request, validators):
+            return not_modified_response(validators, private=True)
+
+        # The cursor holds the sort value and id of the last row of the previous page
+        products, next_cursor = await keyset_page(db, statement, Product.id, cursor, limit, **ordering)
+    response.headers.update(cache_headers(validators, private=True))
+    return {"items": [_expanded_product(product, expand_names) for product in products], "next_cursor": next_cursor}
+
+# Endpoint to search products by name, SKU and description
+# Declared before /products/{product_id} so "search" is not parsed as an id
+@router.get("/products/search", response_model=ProductPage)
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=MAX_QUERY_LENGTH),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+):
+    products, next_cursor = await search_page(db, q.strip(), cursor, limit)
+    return {"items": products, "next_cursor": next_cursor}
 
 # Endpoint to get a single product by ID
-@router.get("/products/{product_id}", response_model=ProductSchema)
-def read_product(product_id: int, db: Session = Depends(get_db)):
-    # Query database for product with specific ID
-    product = db.query(Product).filter(Product.id == product_id).first()
+@router.get("/products/{product_id}", response_model=ProductExpanded, response_model_exclude_unset=True)
+async def read_product(
+    product_id: int,
+    request: Request,
+    response: Response,
+    expand: Optional[str] = Query(None, description="Comma-separated relations to include: category, images"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    expand_names = _parse_expand(expand)
+    # Query database for product with specific ID, with the requested relations
+    product = await db.get(Product, product_id, options=_expand_options(expand_names))
     # Raise 404 if product not found
     if product is None:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    # Answer with 304 when the client already has this version, skipping serialization
+    versions = _expanded_versions(product, expand_names)
+    validators = make_validators("product", expand_names, versions)
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+    response.headers.update(cache_headers(validators))
+    return _expanded_product(product, expand_names)
 
 # Endpoint to update a single product
 @router.put("/products/{product_id}", response_model=ProductSchema)
-def update_product(product_id: int, product: ProductUpdate, db: Session = Depends(get_db)):
+async def update_product(product_id: int, product: ProductUpdate, db: AsyncSession = Depends(get_async_db)):
     # Find product in database
-    db_product = db.query(Product).filter(Product.id == product_id).first()
+    db_product = await db.get(Product, product_id)
    
     # Raise 404 if product not found
     if db_product is None:
@@ -106,51 +387,25 @@ def update_product(product_id: int, product: ProductUpdate, db: Session = Depend
         setattr(db_product, key, value)
     
     # Commit changes
-    db.commit()
+    await db.commit()
     # Refresh product instance
-    db.refresh(db_product)
+    await db.refresh(db_product)
     return db_product
 
 # Endpoint to delete a product
 @router.delete("/products/{product_id}")
-def delete_product(product_id: int, db: Session = Depends(get_db)):
-    # Find product in database
-    db_product = db.query(Product).filter(Product.id == product_id).first()
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
+    # Find product in database, with its images loaded for the delete cascade
+    db_product = await db.get(Product, product_id, options=[selectinload(Product.images)])
     # Raise 404 if product not found
     if db_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
     
+    # Drop the references its images hold on stored files
+    unreferenced = await image_store.release_references(db, [image.content_hash for image in db_product.images])
     # Delete product
-    db.delete(db_product)
+    await db.delete(db_product)
     # Commit changes
-    db.commit()
+    await db.commit()
+    await image_store.remove_unreferenced_files(db, unreferenced)
     return {"message": "Product deleted successfully"}
-
-# Endpoint to update multiple products in one request
-@router.put("/products/bulk", response_model=List[ProductSchema])
-def bulk_update_products(products: List[ProductBulkUpdate], db: Session = Depends(get_db)):
-    updated_products = []
-    
-    for product_update in products:
-        db_product = db.query(Product).filter(Product.id == product_update.id).first()
-        if db_product is None:
-            raise HTTPException(
-                status_code=404, 
-                detail=f"Product with id {product_update.id} not found"
-            )
-        
-        # Encode the description before updating
-        update_data = product_update.model_dump(exclude={'id'})
-        if 'description' in update_data:
-            update_data['description'] = encode_description(update_data['description'])
-        
-        for key, value in update_data.items():
-            setattr(db_product, key, value)
-        
-        updated_products.append(db_product)
-    
-    db.commit()
-    for product in updated_products:
-        db.refresh(product)
-    
-    return updated_products 
\ No newline at end of file
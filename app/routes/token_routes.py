@@ -6,9 +6,9 @@ from app.models.token import Token as TokenModel
 from app.schemas.token import Token 
 from app.schemas.user import User as UserSchema, UserCreate, UserLogin
 from app.models.user import User as UserModel
-from app.database import get_db
-from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException, status
+from app.database import get_async_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import func
 from typing import Annotated
 from fastapi import Depends, HTTPException, status
@@ -16,36 +16,36 @@ from fastapi.security import OAuth2PasswordRequestForm
 router = APIRouter()
 
 @router.post("/register", response_model=UserSchema)
-async def register_user(user: UserCreate, db: Session = Depends(get_db))->UserSchema:
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db))->UserSchema:
     """Register a new user."""
     # Check if username already exists
-    if db.query(UserModel).filter(UserModel.username == user.username).first():
+    if (await db.scalars(select(UserModel).where(UserModel.username == user.username))).first():
         raise HTTPException(status_code=400, detail="Username already registered")
     
     # Check if email already exists
-    if db.query(UserModel).filter(UserModel.email == user.email).first():
+    if (await db.scalars(select(UserModel).where(UserModel.email == user.email))).first():
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    # Create new user
-    hashed_password = auth.get_password_hash(user.password)
+    # Create new user; bcrypt runs on auth.password_hash_pool
+    hashed_password = await auth.get_password_hash_async(user.password)
     db_user = UserModel(
         username=user.username,
         email=user.email,
         hashed_password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.post("/login", response_model=Token)
 async def login(
     form_data: UserLogin,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 )->Token:
     """Login user and return access token."""
     # Authenticate user
-    user = auth.authenticate_user(db, form_data.username, form_data.password)
+    user = await auth.authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -55,22 +55,26 @@ async def login(
     
     # Check for existing valid token
     existing_token = (
-        db.query(TokenModel)
-        .filter(TokenModel.username == user.username)
-        .filter(TokenModel.expires_at > func.now())
-        .first()
-    )
+        await db.scalars(
+            select(TokenModel)
+            .where(TokenModel.username == user.username)
+            .where(TokenModel.expires_at > func.now())
+            # Served from ix_tokens_username_expires_at; hands out the longest-lived token
+            .order_by(TokenModel.expires_at.desc())
+            .limit(1)
+        )
+    ).first()
     
     if existing_token:
         return {"access_token": existing_token.access_token, "token_type": "bearer"}
     
     # Create new token
-    access_token = auth.create_access_token(data={"sub": user.username})
+    access_token = await auth.create_access_token(auth.token_claims(user), db)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/token")
-async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()],db: Session = Depends(get_db)) -> Token:
-    user = auth.authenticate_user(db, form_data.username, form_data.password)
+async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()],db: AsyncSession = Depends(get_async_db)) -> Token:
+    user = await auth.authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -78,7 +82,15 @@ async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm,
             headers={"WWW-Authenticate": "Bearer"},
         )
     #access_token_expires = timedelta(minutes=240)
-    access_token = auth.create_access_token(
-        data={"sub": user.username}
-    )
-    return Token(access_token=access_token, token_type="bearer")
\ No newline at end of file
+    access_token = await auth.create_access_token(auth.token_claims(user), db)
+    return Token(access_token=access_token, token_type="bearer")
+
+@router.post("/logout")
+async def logout(
+    current_user: Annotated[UserSchema, Depends(auth.get_current_active_user)],
+    token: Annotated[str, Depends(auth.oauth2_scheme)],
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Revoke the access token used for this request."""
+    await auth.revoke_token(db, token)
+    return {"message": "Logged out successfully"}
@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
+from decimal import Decimal
 
 class CategoryBase(BaseModel):
     name: str
@@ -23,4 +24,26 @@ class Category(CategoryBase):
     updated_at: Optional[datetime]
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class CategoryPage(BaseModel):
+    items: List[Category]
+    next_cursor: Optional[str] = None
+
+class CategorySummary(BaseModel):
+    id: int
+    name: str
+    status: str
+    product_count: int
+    active_product_count: int
+    in_stock_count: int
+    total_stock: int
+    min_price: Optional[Decimal] = None
+    max_price: Optional[Decimal] = None
+
+    class Config:
+        from_attributes = True
+
+class CategorySummaryPage(BaseModel):
+    items: List[CategorySummary]
+    next_cursor: Optional[str] = None
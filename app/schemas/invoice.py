@@ -0,0 +1,21 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import date
+from decimal import Decimal
+
+class InvoiceItem(BaseModel):
+    name: str
+    quantity: int = Field(gt=0)
+    unit_price: Decimal = Field(ge=0)
+
+class InvoiceCreate(BaseModel):
+    invoice_number: str = Field(min_length=1, max_length=64)
+    customer_name: str
+    customer_address: str
+    items: List[InvoiceItem] = Field(min_length=1)
+    # Defaults to the sum of the item totals
+    total_amount: Optional[Decimal] = None
+    # Defaults to the invoice number
+    barcode_data: Optional[str] = None
+    # Defaults to today
+    invoice_date: Optional[date] = None
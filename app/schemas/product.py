@@ -2,6 +2,8 @@ from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
 from decimal import Decimal
+from app.schemas.category import Category
+from app.schemas.product_image import ProductImage
 
 class ProductBase(BaseModel):
     category_id: Optional[int]=None
@@ -35,4 +37,27 @@ class Product(ProductBase):
     updated_at: Optional[datetime]
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class BulkItemError(BaseModel):
+    index: int
+    id: Optional[int] = None
+    sku: Optional[str] = None
+    detail: str
+
+class ProductBulkResult(BaseModel):
+    items: List[Product]
+    errors: List[BulkItemError] = []
+
+class ProductPage(BaseModel):
+    items: List[Product]
+    next_cursor: Optional[str] = None
+
+# Product with the relations requested through ?expand=; unrequested ones are left out of the response
+class ProductExpanded(Product):
+    category: Optional[Category] = None
+    images: Optional[List[ProductImage]] = None
+
+class ProductExpandedPage(BaseModel):
+    items: List[ProductExpanded]
+    next_cursor: Optional[str] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 
 class ProductImageBase(BaseModel):
@@ -11,6 +11,10 @@ class ProductImageCreate(ProductImageBase):
 class ProductImage(ProductImageBase):
     id: int
     product_id: int
+    image_path: str
+    content_hash: Optional[str] = None
+    # Variant name -> path under uploads/, filled in once the variant has been rendered
+    variants: Optional[Dict[str, str]] = None
     created_at: datetime
     updated_at: Optional[datetime]
 
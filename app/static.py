@@ -1,11 +1,212 @@
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+import mimetypes
 import os
+import re
+import stat
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import Receive, Scope, Send
+from app.config import settings
+from app.utils.cache import ByteLRUCache
+
+# Originals and variants are named after the SHA-256 of their content, so a
+# given URL always returns the same bytes
+CONTENT_ADDRESSED_NAME = re.compile(r"^[0-9a-f]{64}(_[A-Za-z0-9_-]+)?$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Files stored under year/month paths before deduplication can be overwritten in place
+MUTABLE_CACHE_CONTROL = "public, max-age=3600"
+CHUNK_SIZE = 256 * 1024
+
+# Small files (thumbnails) kept in memory, keyed by (path, mtime, size)
+hot_file_cache = ByteLRUCache(
+    max_bytes=settings.uploads_hot_cache_bytes,
+    max_item_bytes=settings.uploads_hot_file_max_bytes,
+)
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single ``bytes=`` range into inclusive (start, end) offsets
+
+    Returns None when the header is absent, malformed or asks for several
+    ranges, in which case the whole file is sent (RFC 9110, section 14.2).
+
+    Raises:
+        ValueError: if the range cannot be satisfied for a file of ``size`` bytes
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, dash, last = header[len("bytes="):].strip().partition("-")
+    if not dash or not (first or last) or (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+class UploadFiles:
+    """
+    ASGI app serving the uploads directory.
+
+    - Content-addressed files get a strong ETag derived from their name and
+      ``Cache-Control: immutable``; other files get an ETag from mtime and size
+    - ``If-None-Match`` / ``If-Modified-Since`` are answered with 304
+    - A single ``Range`` (honouring ``If-Range``) is answered with 206
+    - Files up to ``uploads_hot_file_max_bytes`` are served from a byte-bounded
+      in-memory LRU cache
+    - Larger files go through the ASGI ``http.response.zerocopy`` extension
+      (sendfile) when the server offers it, otherwise they are read in chunks
+      in the threadpool
+    """
+
+    def __init__(self, directory: str):
+        self.directory = os.path.realpath(directory)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["method"] not in ("GET", "HEAD"):
+            await self._send(send, 405, {"Allow": "GET, HEAD"}, b"Method Not Allowed")
+            return
+
+        full_path = self._resolve(scope["path"])
+        try:
+            file_stat = await run_in_threadpool(os.stat, full_path) if full_path else None
+        except OSError:
+            file_stat = None
+        if file_stat is None or not stat.S_ISREG(file_stat.st_mode):
+            await self._send(send, 404, {}, b"Not Found")
+            return
+
+        request_headers = Headers(scope=scope)
+        size = file_stat.st_size
+        last_modified = datetime.fromtimestamp(file_stat.st_mtime, tz=timezone.utc)
+        name = os.path.splitext(os.path.basename(full_path))[0]
+        if CONTENT_ADDRESSED_NAME.match(name):
+            etag = f'"{name}"'
+            cache_control = IMMUTABLE_CACHE_CONTROL
+        else:
+            etag = f'"{file_stat.st_mtime_ns:x}-{size:x}"'
+            cache_control = MUTABLE_CACHE_CONTROL
+        headers = {
+            "ETag": etag,
+            "Last-Modified": format_datetime(last_modified, usegmt=True),
+            "Cache-Control": cache_control,
+            "Accept-Ranges": "bytes",
+            "Content-Type": _content_type(full_path),
+        }
+
+        if self._not_modified(request_headers, etag, last_modified):
+            del headers["Content-Type"]
+            await self._send(send, 304, headers, b"")
+            return
+
+        status, start, end = 200, 0, size - 1
+        if_range = request_headers.get("if-range")
+        if if_range is None or if_range == etag:
+            try:
+                byte_range = parse_range(request_headers.get("range"), size)
+            except ValueError:
+                await self._send(send, 416, {**headers, "Content-Range": f"bytes */{size}"}, b"")
+                return
+            if byte_range is not None:
+                status, (start, end) = 206, byte_range
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        length = end - start + 1 if size else 0
+        headers["Content-Length"] = str(length)
+
+        await send({"type": "http.response.start", "status": status, "headers": _raw(headers)})
+        if scope["method"] == "HEAD" or length == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        key = (full_path, file_stat.st_mtime_ns, size)
+        if size <= hot_file_cache.max_item_bytes:
+            content = hot_file_cache.get(key)
+            if content is None:
+                content = await run_in_threadpool(_read_file, full_path)
+                hot_file_cache.set(key, content)
+            await send({"type": "http.response.body", "body": content[start:end + 1]})
+            return
+
+        zerocopy = "http.response.zerocopy" in (scope.get("extensions") or {})
+        file = await run_in_threadpool(open, full_path, "rb")
+        try:
+            if zerocopy:
+                # The server hands the file to sendfile(), the bytes never pass through Python
+                await send({"type": "http.response.zerocopy", "file": file, "offset": start, "count": length})
+                return
+            await run_in_threadpool(file.seek, start)
+            remaining = length
+            while remaining > 0:
+                chunk = await run_in_threadpool(file.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # The file shrank while being sent
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            await run_in_threadpool(file.close)
+
+    def _resolve(self, path: str) -> Optional[str]:
+        # Hidden entries (such as the .tmp upload spool) are never served
+        parts = [part for part in path.split("/") if part]
+        if not parts or any(part.startswith(".") for part in parts):
+            return None
+        full_path = os.path.realpath(os.path.join(self.directory, *parts))
+        if os.path.commonpath([full_path, self.directory]) != self.directory:
+            return None
+        return full_path
+
+    def _not_modified(self, request_headers: Headers, etag: str, last_modified: datetime) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            return if_none_match.strip() == "*" or etag in (
+                candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")
+            )
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+
+    async def _send(self, send: Send, status: int, headers: dict, body: bytes):
+        headers = {**headers, "Content-Length": str(len(body))}
+        await send({"type": "http.response.start", "status": status, "headers": _raw(headers)})
+        await send({"type": "http.response.body", "body": body})
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+def _content_type(path: str) -> str:
+    content_type, _ = mimetypes.guess_type(path)
+    return content_type or "application/octet-stream"
+
+def _raw(headers: dict) -> list:
+    return [(key.lower().encode("latin-1"), value.encode("latin-1")) for key, value in headers.items()]
+
 
 def setup_static_files(app: FastAPI):
     # Create uploads directory if it doesn't exist
-    if not os.path.exists("uploads"):
-        os.makedirs("uploads")
-    
+    if not os.path.exists(settings.upload_dir):
+        os.makedirs(settings.upload_dir)
+
     # Mount the uploads directory
-    app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads") 
\ No newline at end of file
+    app.mount("/uploads", UploadFiles(directory=settings.upload_dir), name="uploads")
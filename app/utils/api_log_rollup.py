@@ -0,0 +1,133 @@
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+from app.config import settings
+from app.database import session_scope, delete_in_batches
+from app.models.api_log import APILog
+from app.models.api_log_rollup import APILogRollup
+from app.utils.periodic import PeriodicTask
+
+MINUTE = timedelta(minutes=1)
+
+def _floor_minute(value: datetime) -> datetime:
+    return value.replace(second=0, microsecond=0)
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of already sorted ``values``."""
+    if not values:
+        return None
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)]
+
+def rollup_watermark(db) -> Optional[datetime]:
+    """End of the last minute rolled up, or None before the first rollup."""
+    last_bucket = db.scalar(select(func.max(APILogRollup.bucket)))
+    return last_bucket + MINUTE if last_bucket is not None else None
+
+def _summarize(bucket: datetime, route: str, method: str, statuses: List[int], latencies: List[float]) -> dict:
+    latencies.sort()
+    return {
+        "bucket": bucket,
+        "route": route,
+        "method": method,
+        "request_count": len(statuses),
+        "error_count": sum(1 for status in statuses if status >= 500),
+        "client_error_count": sum(1 for status in statuses if 400 <= status < 500),
+        "latency_avg": sum(latencies) / len(latencies) if latencies else None,
+        "latency_p50": percentile(latencies, 0.50),
+        "latency_p90": percentile(latencies, 0.90),
+        "latency_p99": percentile(latencies, 0.99),
+        "latency_max": latencies[-1] if latencies else None,
+    }
+
+def rollup_api_logs(now: datetime) -> int:
+    """
+    Summarize raw api_logs rows into api_log_rollups, one row per minute, route and method
+
+    Picks up after the last rolled up minute and stops ``api_log_rollup_settle_seconds``
+    before ``now``, so rows still queued in the batched writer are not missed.
+    Rows are read one window of ``api_log_rollup_window_minutes`` at a time
+    through the created_at index and each window is committed on its own.
+    Minutes without traffic are skipped with an index seek.
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    cutoff = _floor_minute(now - timedelta(seconds=settings.api_log_rollup_settle_seconds))
+    window = timedelta(minutes=settings.api_log_rollup_window_minutes)
+    written = 0
+    with session_scope() as db:
+        start = rollup_watermark(db)
+        while True:
+            # Jump to the next minute with traffic
+            next_row = db.scalar(
+                select(func.min(APILog.created_at)).where(
+                    APILog.created_at < cutoff, *([APILog.created_at >= start] if start is not None else [])
+                )
+            )
+            if next_row is None:
+                return written
+            start = _floor_minute(next_row)
+            end = min(start + window, cutoff)
+
+            groups: Dict[tuple, tuple] = defaultdict(lambda: ([], []))
+            rows = db.execute(
+                select(APILog.created_at, APILog.route, APILog.endpoint, APILog.method,
+                       APILog.response_status, APILog.execution_time)
+                .where(APILog.created_at >= start, APILog.created_at < end)
+                .execution_options(yield_per=settings.api_log_delete_batch_size)
+            )
+            for created_at, route, endpoint, method, status, execution_time in rows:
+                # Rows logged before the route column existed are grouped by their path
+                statuses, latencies = groups[(_floor_minute(created_at), route or endpoint, method)]
+                statuses.append(status)
+                if execution_time is not None:
+                    latencies.append(execution_time)
+
+            summaries = [_summarize(*key, *values) for key, values in groups.items()]
+            try:
+                if summaries:
+                    db.execute(APILogRollup.__table__.insert(), summaries)
+                db.commit()
+            except IntegrityError:
+                # Another worker rolled up the same minutes first
+                db.rollback()
+                return written
+            written += len(summaries)
+            start = end
+
+def purge_api_logs(now: datetime) -> dict:
+    """
+    Delete raw api_logs rows older than ``api_log_retention_days`` and rollups older
+    than ``api_log_rollup_retention_days``
+
+    Raw rows are only deleted once their minute has been rolled up.
+    """
+    with session_scope() as db:
+        raw_cutoff = now - timedelta(days=settings.api_log_retention_days)
+        watermark = rollup_watermark(db)
+        deleted_logs = 0
+        if watermark is not None:
+            deleted_logs = delete_in_batches(
+                db, APILog, APILog.created_at < min(raw_cutoff, watermark),
+                settings.api_log_delete_batch_size, settings.api_log_delete_pause,
+            )
+        rollup_cutoff = now - timedelta(days=settings.api_log_rollup_retention_days)
+        deleted_rollups = delete_in_batches(
+            db, APILogRollup, APILogRollup.bucket < rollup_cutoff,
+            settings.api_log_delete_batch_size, settings.api_log_delete_pause,
+        )
+    return {"deleted_logs": deleted_logs, "deleted_rollups": deleted_rollups}
+
+def maintain_api_logs() -> dict:
+    """Roll up, then apply retention. Runs in the threadpool every api_log_maintenance_interval seconds."""
+    # api_logs.created_at is written with datetime.now(), so the same clock is used here
+    now = datetime.now()
+    return {"rollup_rows": rollup_api_logs(now), **purge_api_logs(now)}
+
+
+api_log_maintenance = PeriodicTask(
+    "API log maintenance", maintain_api_logs, interval=settings.api_log_maintenance_interval
+)
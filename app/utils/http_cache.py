@@ -0,0 +1,43 @@
+import hashlib
+from typing import NamedTuple
+from fastapi import Request, Response
+from app.config import settings
+
+class Validators(NamedTuple):
+    """ETag of a response, derived from row metadata instead of the body."""
+    etag: str
+
+def make_validators(*parts) -> Validators:
+    """
+    Build validators from values that change whenever the response would change,
+    e.g. the id and ``version`` of a row, or an aggregate over a page of rows
+
+    ``version`` is incremented by every write, so two writes within the same
+    second give different ETags. No Last-Modified is sent: HTTP dates have
+    one second resolution, so If-Modified-Since would answer 304 after such
+    a second write.
+    """
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:20]
+    return Validators(etag=f'"{digest}"')
+
+def cache_headers(validators: Validators, private: bool = False) -> dict:
+    return {
+        "ETag": validators.etag,
+        # Clients may reuse the response for max_age seconds, then must revalidate
+        "Cache-Control": f"{'private' if private else 'public'}, max-age={settings.http_cache_max_age}, must-revalidate",
+    }
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored on both sides
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+def is_not_modified(request: Request, validators: Validators) -> bool:
+    """True when the client's cached copy, identified by If-None-Match, is still current."""
+    if_none_match = request.headers.get("if-none-match")
+    return if_none_match is not None and _etag_matches(if_none_match, validators.etag)
+
+def not_modified_response(validators: Validators, private: bool = False) -> Response:
+    return Response(status_code=304, headers=cache_headers(validators, private))
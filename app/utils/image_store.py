@@ -0,0 +1,186 @@
+import glob
+import hashlib
+import mimetypes
+import os
+import tempfile
+from collections import Counter
+from typing import Iterable, List, NamedTuple, Optional
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects import mysql, sqlite
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.models.image_blob import ImageBlob
+
+UPLOAD_DIR = settings.upload_dir
+# Uploads are written here first; same filesystem as UPLOAD_DIR so moving them into place is a rename
+TMP_DIR = os.path.join(UPLOAD_DIR, ".tmp")
+# Resized/re-encoded derivatives, relative to UPLOAD_DIR
+VARIANT_DIR = "variants"
+
+class SpooledUpload(NamedTuple):
+    """An upload copied to a temporary file under TMP_DIR, with its digest."""
+    tmp_path: str
+    sha256: str
+    size: int
+
+class UploadTooLarge(Exception):
+    pass
+
+def blob_path(sha256: str, extension: str) -> str:
+    """Content-addressed location relative to UPLOAD_DIR, fanned out over two directory levels."""
+    return os.path.join(sha256[:2], sha256[2:4], sha256 + extension)
+
+def content_key(image) -> str:
+    """Key of the stored content of a ProductImage; images stored before deduplication are keyed by their path."""
+    return image.content_hash or hashlib.sha256(image.image_path.encode("utf-8")).hexdigest()
+
+def variant_path(key: str, name: str, extension: str) -> str:
+    """Location of a derivative of the content ``key``, relative to UPLOAD_DIR; shared by every image with that content."""
+    return os.path.join(VARIANT_DIR, key[:2], key[2:4], f"{key}_{name}{extension}")
+
+def remove_variants(key: str):
+    """Remove every derivative of the content ``key``."""
+    _remove_files(
+        os.path.relpath(path, UPLOAD_DIR)
+        for path in glob.glob(os.path.join(UPLOAD_DIR, variant_path(glob.escape(key), "*", ".*")))
+    )
+
+def file_extension(filename: Optional[str], content_type: Optional[str]) -> str:
+    extension = os.path.splitext(filename or "")[1].lower()
+    if 1 < len(extension) <= 10 and extension[1:].isalnum():
+        return extension
+    return mimetypes.guess_extension(content_type or "") or ""
+
+def _spool(source, max_bytes: int, chunk_size: int) -> SpooledUpload:
+    os.makedirs(TMP_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=TMP_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            source.seek(0)
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(size)
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return SpooledUpload(tmp_path, digest.hexdigest(), size)
+
+async def spool_upload(file: UploadFile) -> SpooledUpload:
+    """
+    Copy an upload to a temporary file in fixed-size chunks, hashing it on the way
+
+    The copy runs in the threadpool, so the event loop never waits on disk IO.
+
+    Raises:
+        HTTPException: 413 if the upload is larger than ``image_upload_max_bytes``
+    """
+    max_bytes = settings.image_upload_max_bytes
+    too_large = HTTPException(status_code=413, detail=f"Image must not be larger than {max_bytes} bytes")
+    # The multipart parser already knows the size, so oversized files are rejected without copying
+    if file.size is not None and file.size > max_bytes:
+        raise too_large
+    try:
+        return await run_in_threadpool(_spool, file.file, max_bytes, settings.image_upload_chunk_size)
+    except UploadTooLarge:
+        raise too_large
+
+def discard(upload: SpooledUpload):
+    if os.path.exists(upload.tmp_path):
+        os.remove(upload.tmp_path)
+
+def _reference_statement(db, values: dict):
+    # One atomic statement either creates the blob or takes another reference to it,
+    # so concurrent uploads of the same file cannot race on the unique sha256
+    if db.bind.dialect.name == "sqlite":
+        statement = sqlite.insert(ImageBlob).values(**values)
+        return statement.on_conflict_do_update(
+            index_elements=[ImageBlob.sha256],
+            set_={"ref_count": ImageBlob.ref_count + 1, "updated_at": func.now()},
+        )
+    statement = mysql.insert(ImageBlob).values(**values)
+    return statement.on_duplicate_key_update(ref_count=ImageBlob.ref_count + 1, updated_at=func.now())
+
+def move_into_place(upload: SpooledUpload, path: str):
+    """
+    Move a spooled upload to ``path``, relative to UPLOAD_DIR
+
+    Called once the reference taken by add_reference is committed, so a failed
+    commit leaves no file behind that no blob points at.
+    """
+    target = os.path.join(UPLOAD_DIR, path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # Identical content either way; replacing also restores a file that a concurrent delete just removed
+    os.replace(upload.tmp_path, target)
+
+async def add_reference(db, upload: SpooledUpload, filename: Optional[str], content_type: Optional[str]) -> ImageBlob:
+    """
+    Take a reference to the blob holding the upload's content, creating the blob if it is new
+
+    The reference is part of the caller's transaction; the caller commits,
+    then stores the file at ``blob.path`` with move_into_place.
+    """
+    await db.execute(_reference_statement(db, {
+        "sha256": upload.sha256,
+        "path": blob_path(upload.sha256, file_extension(filename, content_type)),
+        "size": upload.size,
+        "content_type": content_type,
+        "ref_count": 1,
+    }))
+    blob = (await db.scalars(
+        select(ImageBlob).where(ImageBlob.sha256 == upload.sha256).execution_options(populate_existing=True)
+    )).one()
+    return blob
+
+async def release_references(db, content_hashes: Iterable[str]) -> List[ImageBlob]:
+    """
+    Drop one reference per hash and delete blobs nobody points at any more
+
+    Part of the caller's transaction. Returns the deleted blobs, whose files the
+    caller removes with remove_unreferenced_files once the transaction is committed.
+    """
+    counts = Counter(content_hash for content_hash in content_hashes if content_hash)
+    if not counts:
+        return []
+    for content_hash, count in counts.items():
+        await db.execute(
+            update(ImageBlob).where(ImageBlob.sha256 == content_hash).values(ref_count=ImageBlob.ref_count - count)
+        )
+    unreferenced = (await db.scalars(
+        select(ImageBlob).where(ImageBlob.sha256.in_(counts), ImageBlob.ref_count <= 0)
+    )).all()
+    if unreferenced:
+        await db.execute(delete(ImageBlob).where(ImageBlob.id.in_([blob.id for blob in unreferenced])))
+    return unreferenced
+
+def _remove_files(paths: Iterable[str]):
+    for path in paths:
+        file_path = os.path.join(UPLOAD_DIR, path)
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Failed to delete file {file_path}: {str(e)}")
+
+def _remove_blob_files(blobs: List[ImageBlob]):
+    for blob in blobs:
+        _remove_files([blob.path])
+        remove_variants(blob.sha256)
+
+async def remove_unreferenced_files(db, blobs: List[ImageBlob]):
+    """Remove the files of blobs deleted by release_references, unless an upload has re-created them since."""
+    if not blobs:
+        return
+    recreated = set((await db.scalars(
+        select(ImageBlob.sha256).where(ImageBlob.sha256.in_([blob.sha256 for blob in blobs]))
+    )).all())
+    await run_in_threadpool(_remove_blob_files, [blob for blob in blobs if blob.sha256 not in recreated])
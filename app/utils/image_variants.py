@@ -0,0 +1,112 @@
+import asyncio
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+from fastapi import HTTPException
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.product_image import ProductImage
+from app.utils.image_store import UPLOAD_DIR, content_key, variant_path
+from app.utils.worker_pool import BoundedExecutor
+
+def parse_variants(spec: str) -> Dict[str, int]:
+    """Parse ``"thumb=200,medium=800"`` into ``{"thumb": 200, "medium": 800}`` (name -> longest edge in pixels)."""
+    variants = {}
+    for item in spec.split(","):
+        if item.strip():
+            name, _, size = item.partition("=")
+            variants[name.strip()] = int(size)
+    return variants
+
+VARIANTS = parse_variants(settings.image_variants)
+VARIANT_FORMAT = settings.image_variant_format.lower()
+VARIANT_EXTENSION = "." + VARIANT_FORMAT
+
+# Decoding and encoding are CPU bound and hold the GIL, so they run in worker
+# processes rather than threads
+variant_pool = BoundedExecutor(
+    ProcessPoolExecutor(max_workers=settings.image_variant_workers),
+    max_pending=settings.image_variant_max_queue,
+    name="Image processing",
+)
+
+# Renders in progress, keyed by variant path, so concurrent requests for a
+# missing variant share one render
+_rendering: Dict[str, asyncio.Future] = {}
+
+
+def render_variant(source: str, target: str, max_size: int, image_format: str, quality: int):
+    """Resize ``source`` to fit in ``max_size`` x ``max_size`` and save it as ``target``. Runs in a worker process."""
+    from PIL import Image
+
+    with Image.open(source) as image:
+        image.thumbnail((max_size, max_size))
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+        try:
+            with os.fdopen(fd, "wb") as out:
+                image.save(out, format=image_format, quality=quality)
+            # Readers never see a partly written variant
+            os.replace(tmp_path, target)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+async def ensure_variant(image: ProductImage, name: str) -> str:
+    """
+    Return the path of variant ``name`` of an image, relative to UPLOAD_DIR, rendering it if it does not exist yet
+
+    Variants are stored by content, so images sharing a file also share their
+    variants and a variant is rendered once no matter how many images use it.
+
+    Raises:
+        HTTPException: 404 for an unknown variant, 422 if the image cannot be decoded,
+            503 when the image processing pool is saturated
+    """
+    if name not in VARIANTS:
+        raise HTTPException(status_code=404, detail="Image variant not found")
+    path = variant_path(content_key(image), name, VARIANT_EXTENSION)
+    if os.path.exists(os.path.join(UPLOAD_DIR, path)):
+        return path
+
+    render = _rendering.get(path)
+    if render is None:
+        render = asyncio.ensure_future(variant_pool.run(
+            render_variant,
+            os.path.join(UPLOAD_DIR, image.image_path),
+            os.path.join(UPLOAD_DIR, path),
+            VARIANTS[name],
+            VARIANT_FORMAT,
+            settings.image_variant_quality,
+        ))
+        _rendering[path] = render
+        render.add_done_callback(lambda _: _rendering.pop(path, None))
+    try:
+        # Shielded so a client going away does not cancel a render other requests wait for
+        await asyncio.shield(render)
+    except HTTPException:
+        raise
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image file not found")
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Failed to process image: {str(e)}")
+    return path
+
+async def generate_variants(image_id: int):
+    """Render every configured variant of an image and record the paths; run as a background task after upload."""
+    async with AsyncSessionLocal() as db:
+        image = await db.get(ProductImage, image_id)
+        if image is None:
+            return
+        variants = dict(image.variants or {})
+        for name in VARIANTS:
+            try:
+                variants[name] = await ensure_variant(image, name)
+            except HTTPException as e:
+                # Left for the first request of the variant to render
+                print(f"Failed to render variant {name} of image {image_id}: {e.detail}")
+        image.variants = variants
+        await db.commit()
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import time
+import zipfile
+from concurrent.futures import Executor, FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import count, islice
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from fastapi import HTTPException
+from pydantic import ValidationError
+from app.config import settings
+from app.schemas.invoice import InvoiceCreate
+from app.utils.invoice_pdf import render_invoice, pdf_filename
+
+class InvoiceResult(NamedTuple):
+    index: int
+    invoice_number: str
+    pdf: Optional[bytes]
+    error: Optional[str]
+
+# Called with (rendered, failed, total); total is None while the specs are still being read
+ProgressCallback = Callable[[int, int, Optional[int]], None]
+
+
+def render_chunk(chunk: List[Tuple[int, dict]]) -> List[InvoiceResult]:
+    """
+    Validate and render a chunk of (index, spec) pairs. Runs in a worker process.
+
+    A spec that fails validation or rendering becomes a result with an error
+    instead of failing the chunk.
+    """
+    results = []
+    for index, spec in chunk:
+        if not isinstance(spec, dict):
+            results.append(InvoiceResult(index, "", None, "Invalid invoice: expected a JSON object"))
+            continue
+        invoice_number = str(spec.get("invoice_number", ""))
+        try:
+            invoice = InvoiceCreate.model_validate(spec)
+            results.append(InvoiceResult(index, invoice_number, render_invoice(invoice.model_dump(exclude_none=True)), None))
+        except ValidationError as e:
+            error = e.errors()[0]
+            location = ".".join(str(part) for part in error["loc"])
+            results.append(InvoiceResult(index, invoice_number, None, f"Invalid invoice: {location}: {error['msg']}"))
+        except Exception as e:
+            results.append(InvoiceResult(index, invoice_number, None, f"{type(e).__name__}: {e}"))
+    return results
+
+def _chunks(specs: Iterable[dict], size: int) -> Iterator[List[Tuple[int, dict]]]:
+    numbered = zip(count(), specs)
+    while True:
+        chunk = list(islice(numbered, size))
+        if not chunk:
+            return
+        yield chunk
+
+def render_invoices(specs: Iterable[dict], executor: Executor, chunk_size: int, max_in_flight: int) -> Iterator[InvoiceResult]:
+    """
+    Render ``specs`` on ``executor``, yielding results as chunks complete (not in input order)
+
+    Specs are read lazily and at most ``max_in_flight`` chunks are queued at
+    once, so memory use does not grow with the size of the batch.
+    """
+    chunks = _chunks(specs, chunk_size)
+    pending = set()
+    while True:
+        for chunk in islice(chunks, max_in_flight - len(pending)):
+            pending.add(executor.submit(render_chunk, chunk))
+        if not pending:
+            return
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield from future.result()
+
+async def render_invoices_async(
+    specs: Iterable[dict], executor: Executor, chunk_size: int, max_in_flight: int
+) -> AsyncIterator[InvoiceResult]:
+    """render_invoices for the event loop: waits for chunks without blocking it."""
+    loop = asyncio.get_running_loop()
+    chunks = _chunks(specs, chunk_size)
+    pending = set()
+    while True:
+        for chunk in islice(chunks, max_in_flight - len(pending)):
+            pending.add(loop.run_in_executor(executor, render_chunk, chunk))
+        if not pending:
+            return
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            for result in future.result():
+                yield result
+
+
+class InvoiceZip:
+    """
+    ZIP archive of rendered invoices, written without seeking
+
+    Data written so far is collected with ``take()``, so the archive can be
+    streamed as it grows. Failures are listed in ``manifest.json``, the last
+    entry of the archive.
+    """
+
+    def __init__(self, progress: Optional[ProgressCallback] = None, total: Optional[int] = None):
+        self._buffer = bytearray()
+        # PDFs are already compressed, so entries are stored as is
+        self._zip = zipfile.ZipFile(self, "w", compression=zipfile.ZIP_STORED)
+        self._names = set()
+        self.progress = progress
+        self.total = total
+        self.rendered = 0
+        self.failures: List[Dict] = []
+
+    # File object interface used by ZipFile; no tell()/seek(), so it writes data descriptors
+    def write(self, data) -> int:
+        self._buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+    def add(self, result: InvoiceResult):
+        if result.error is None:
+            name = pdf_filename(result.invoice_number)
+            if name in self._names:
+                # Invoice numbers are not guaranteed unique within a batch
+                name = f"{result.index:06d}_{name}"
+            self._names.add(name)
+            self._zip.writestr(name, result.pdf)
+            self.rendered += 1
+        else:
+            self.failures.append({"index": result.index, "invoice_number": result.invoice_number, "error": result.error})
+        if self.progress is not None:
+            self.progress(self.rendered, len(self.failures), self.total)
+
+    def close(self):
+        manifest = {"rendered": self.rendered, "failed": len(self.failures), "failures": self.failures}
+        self._zip.writestr("manifest.json", json.dumps(manifest, indent=2))
+        self._zip.close()
+
+
+class BatchTracker:
+    """Progress of the batches running in this process, for /internal/invoice-batches."""
+
+    def __init__(self, max_running: int):
+        self.max_running = max_running
+        self._ids = count(1)
+        self.running: Dict[int, Dict] = {}
+        self.completed = 0
+        self.rejected = 0
+
+    def start(self, total: int) -> int:
+        if len(self.running) >= self.max_running:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Invoice batches are busy, please retry",
+                headers={"Retry-After": "30"},
+            )
+        batch_id = next(self._ids)
+        self.running[batch_id] = {"total": total, "rendered": 0, "failed": 0, "started": time.time()}
+        return batch_id
+
+    def progress(self, batch_id: int) -> ProgressCallback:
+        def update(rendered: int, failed: int, total: Optional[int]):
+            self.running[batch_id].update(rendered=rendered, failed=failed)
+        return update
+
+    def finish(self, batch_id: int):
+        self.running.pop(batch_id, None)
+        self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "max_running": self.max_running,
+            "running": self.running,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+batch_tracker = BatchTracker(max_running=settings.invoice_batch_max_running)
+# Separate from invoice_pool so a batch cannot starve single invoice requests
+invoice_batch_pool = ProcessPoolExecutor(max_workers=settings.invoice_batch_workers)
@@ -0,0 +1,166 @@
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from functools import lru_cache
+from typing import List, Optional
+from reportlab.graphics.barcode.code128 import Code128
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from app.config import settings
+from app.utils.worker_pool import BoundedExecutor
+
+# Styles and table templates are built once per process and shared by every
+# invoice; flowables are still created per invoice because platypus stores
+# layout state on them while building
+STYLES = getSampleStyleSheet()
+DETAILS_COL_WIDTHS = [3*inch, 4*inch]
+DETAILS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0,0), (0,-1), colors.lightgrey),
+    ('GRID', (0,0), (-1,-1), 1, colors.black),
+    ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),  # Vertical alignment
+    ('ALIGN', (0,0), (1,-1), 'CENTER')  # Center align the barcode
+])
+ITEMS_COL_WIDTHS = [3*inch, 1*inch, 1.5*inch, 1.5*inch]
+ITEMS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+    ('GRID', (0,0), (-1,-1), 1, colors.black),
+    ('ALIGN', (0,0), (-1,-1), 'CENTER')
+])
+ITEMS_HEADER = ["Item", "Quantity", "Unit Price", "Total"]
+
+COMPANY_NAME = "ACME Delivery Services"
+COMPANY_LINES = ["123 Delivery Street, Logistics City", "Phone: (555) 123-4567"]
+
+@lru_cache(maxsize=settings.invoice_barcode_cache_size)
+def code128_barcode(data: str, height: float = 0.5*inch) -> Code128:
+    """
+    Code128 barcode flowable of ``data``, ``height`` high, cached by value
+
+    Invoices rendered again reuse the flowable instead of building a new one.
+    Platypus only sets the canvas on a flowable while drawing it, and every
+    process renders one invoice at a time, so one instance can be shared by
+    any number of invoices.
+    """
+    return Code128(data, barWidth=1.2, barHeight=height, humanReadable=False)
+
+
+class DeliveryInvoice:
+    def __init__(self, invoice_number, customer_name, customer_address, items, total_amount, barcode_data,
+                 invoice_date: Optional[date] = None):
+        self.invoice_number = invoice_number
+        self.customer_name = customer_name
+        self.customer_address = customer_address
+        self.items = items
+        self.total_amount = total_amount
+        self.invoice_date = invoice_date or date.today()
+        self.barcode_data = barcode_data
+
+    def generate_barcode(self, data, width=2*inch, height=0.5*inch):
+        """
+        Generate a barcode using ReportLab's built-in functionality
+
+        :param data: String to encode in barcode
+        :param width: Width of barcode (default: 2 inches); the table cell centers it, so it is not used
+        :param height: Height of barcode (default: 0.5 inches)
+        :return: Flowable drawing the barcode, or None if ``data`` cannot be encoded
+        """
+        try:
+            return code128_barcode(str(data), height)
+        except Exception as e:
+            print(f"Error generating barcode: {e}")
+            return None
+
+    def story(self) -> List:
+        """Flowables making up the invoice."""
+        normal = STYLES['Normal']
+        # Blank lines are Spacers of the same height, which need no text layout
+        story = [Paragraph(COMPANY_NAME, STYLES['Title'])]
+        story.extend(Paragraph(line, normal) for line in COMPANY_LINES)
+        story.append(Spacer(1, normal.leading))
+
+        # Invoice details
+        details = [
+            ["Invoice Number", self.invoice_number],
+            ["Invoice Date", self.invoice_date.strftime("%B %d, %Y")],
+            ["Customer", self.customer_name],
+            ["Delivery Address", self.customer_address],
+        ]
+        # Add barcode if generation was successful
+        barcode = self.generate_barcode(self.barcode_data) if self.barcode_data else None
+        if barcode is not None:
+            details.append(["Barcode", barcode])
+        details_table = Table(details, colWidths=DETAILS_COL_WIDTHS)
+        details_table.setStyle(DETAILS_TABLE_STYLE)
+        story.append(details_table)
+        story.append(Spacer(1, normal.leading))
+
+        # Items table, with a total row
+        table_data = [list(ITEMS_HEADER)]
+        for item in self.items:
+            table_data.append([
+                item['name'],
+                item['quantity'],
+                f"${item['unit_price']:.2f}",
+                f"${item['quantity'] * item['unit_price']:.2f}"
+            ])
+        table_data.append(["", "", "Total:", f"${self.total_amount:.2f}"])
+        items_table = Table(table_data, colWidths=ITEMS_COL_WIDTHS)
+        items_table.setStyle(ITEMS_TABLE_STYLE)
+        story.append(items_table)
+
+        # Footer
+        story.append(Spacer(1, normal.leading))
+        story.append(Paragraph("Thank you for your business!", normal))
+        return story
+
+    def write_pdf(self, output) -> None:
+        """Render the invoice into ``output``, a path or a binary file object."""
+        doc = SimpleDocTemplate(output, pagesize=letter, title=f"Invoice {self.invoice_number}")
+        doc.build(self.story())
+
+    def render(self) -> bytes:
+        """Render the invoice in memory and return the PDF."""
+        buffer = io.BytesIO()
+        self.write_pdf(buffer)
+        return buffer.getvalue()
+
+    def generate_pdf(self, filename='delivery_invoice.pdf'):
+        """
+        Generate PDF invoice
+
+        :param filename: Output PDF filename
+        :return: Path to generated PDF
+        """
+        self.write_pdf(filename)
+        return os.path.abspath(filename)
+
+
+def pdf_filename(invoice_number: str) -> str:
+    """File name for an invoice's PDF, safe for Content-Disposition and ZIP entries."""
+    return re.sub(r"[^A-Za-z0-9._-]", "_", invoice_number) + ".pdf"
+
+def render_invoice(invoice: dict) -> bytes:
+    """
+    Render an invoice given as a dict of DeliveryInvoice arguments
+
+    The total defaults to the sum of the item totals. Takes and returns plain
+    data so it can run in a worker process.
+    """
+    invoice = dict(invoice)
+    if invoice.get("total_amount") is None:
+        invoice["total_amount"] = sum(item["quantity"] * item["unit_price"] for item in invoice["items"])
+    invoice.setdefault("barcode_data", invoice["invoice_number"])
+    return DeliveryInvoice(**invoice).render()
+
+# Rendering is pure Python and holds the GIL, so it runs in worker processes;
+# each worker keeps its own styles and barcode cache
+invoice_pool = BoundedExecutor(
+    ProcessPoolExecutor(max_workers=settings.invoice_workers),
+    max_pending=settings.invoice_max_queue,
+    name="Invoice rendering",
+)
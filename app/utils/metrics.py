@@ -0,0 +1,177 @@
+import glob
+import json
+import os
+import tempfile
+import threading
+import uuid
+from bisect import bisect_left
+from typing import Dict, Iterable, Optional, Tuple
+from app.config import settings
+from app.utils.periodic import PeriodicTask
+
+def parse_buckets(spec: str) -> Tuple[float, ...]:
+    """Parse ``"0.01,0.1,1"`` into sorted histogram bucket upper bounds, in seconds."""
+    return tuple(sorted(float(item) for item in spec.split(",") if item.strip()))
+
+LATENCY_BUCKETS = parse_buckets(settings.metrics_latency_buckets)
+
+# Unset, each worker only reports its own counters
+METRICS_DIR = settings.metrics_dir or None
+
+_Key = Tuple[str, str]
+
+
+class _RouteStats:
+    __slots__ = ("buckets", "latency_sum", "statuses")
+
+    def __init__(self, bucket_count: int):
+        # Non-cumulative counts, the last one for observations above every bound (+Inf)
+        self.buckets = [0] * (bucket_count + 1)
+        self.latency_sum = 0.0
+        self.statuses: Dict[int, int] = {}
+
+
+class RequestMetrics:
+    """
+    Request counts per status and latency histograms per route template and method
+
+    ``observe`` is called once per request and only does a bisect and a few
+    increments. Each worker process keeps its own counters and, when a
+    ``directory`` is set, publishes them there as ``<pid>-<random>.json``
+    every few seconds. ``render`` first publishes this worker's counters,
+    then adds up every file in the directory. Each file only ever grows, so
+    the totals never go down between scrapes, whichever worker answers them.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...], directory: Optional[str]):
+        self.bucket_bounds = buckets
+        self.directory = directory
+        self._routes: Dict[_Key, _RouteStats] = {}
+        # observe() runs on the event loop, snapshot() from the threadpool
+        self._lock = threading.Lock()
+        self._file_owner = None
+
+    @property
+    def path(self) -> str:
+        # Looked up on use, so workers forked from a preloaded app get their own file. The
+        # random part keeps a worker that reuses the pid of an exited one from overwriting its file.
+        if self._file_owner is None or self._file_owner[0] != os.getpid():
+            self._file_owner = (os.getpid(), uuid.uuid4().hex[:12])
+        pid, token = self._file_owner
+        return os.path.join(self.directory, f"{pid}-{token}.json")
+
+    def observe(self, route: str, method: str, status: int, seconds: float):
+        with self._lock:
+            stats = self._routes.get((route, method))
+            if stats is None:
+                stats = self._routes[(route, method)] = _RouteStats(len(self.bucket_bounds))
+            stats.buckets[bisect_left(self.bucket_bounds, seconds)] += 1
+            stats.latency_sum += seconds
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            routes = [
+                {
+                    "route": route,
+                    "method": method,
+                    "buckets": list(stats.buckets),
+                    "latency_sum": stats.latency_sum,
+                    "statuses": {str(status): count for status, count in stats.statuses.items()},
+                }
+                for (route, method), stats in self._routes.items()
+            ]
+        return {"pid": os.getpid(), "buckets": list(self.bucket_bounds), "routes": routes}
+
+    def publish(self) -> dict:
+        """Write this worker's counters to its snapshot file, atomically."""
+        snapshot = self.snapshot()
+        if self.directory is None:
+            return {"routes": len(snapshot["routes"])}
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(snapshot, file)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return {"routes": len(snapshot["routes"])}
+
+    def _snapshots(self) -> Iterable[dict]:
+        if self.directory is None:
+            yield self.snapshot()
+            return
+        # Every worker's last published counters, this one's published just now. Live
+        # counters are not mixed in: they would be ahead of this worker's file, and a
+        # scrape answered by another worker would then see a lower total.
+        # Files of workers that have exited are kept so the totals never go down.
+        self.publish()
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                with open(path) as file:
+                    snapshot = json.load(file)
+            except (OSError, ValueError):
+                continue
+            if snapshot.get("buckets") == list(self.bucket_bounds):
+                # Files written with other buckets (before a config change) cannot be merged
+                yield snapshot
+
+    def collect(self) -> Dict[_Key, dict]:
+        """Counters of every worker, added up per route and method."""
+        merged: Dict[_Key, dict] = {}
+        for snapshot in self._snapshots():
+            for entry in snapshot["routes"]:
+                totals = merged.setdefault(
+                    (entry["route"], entry["method"]),
+                    {"buckets": [0] * (len(self.bucket_bounds) + 1), "latency_sum": 0.0, "statuses": {}},
+                )
+                totals["buckets"] = [a + b for a, b in zip(totals["buckets"], entry["buckets"])]
+                totals["latency_sum"] += entry["latency_sum"]
+                for status, count in entry["statuses"].items():
+                    totals["statuses"][status] = totals["statuses"].get(status, 0) + count
+        return merged
+
+    def render(self) -> str:
+        """All workers' counters in the Prometheus text exposition format."""
+        merged = self.collect()
+        lines = [
+            "# HELP http_requests_total Requests handled, by route template, method and status code.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (route, method), totals in sorted(merged.items()):
+            labels = _labels(route=route, method=method)
+            for status, count in sorted(totals["statuses"].items()):
+                lines.append(f'http_requests_total{{{labels},status="{status}"}} {count}')
+        lines += [
+            "# HELP http_request_duration_seconds Request latency, by route template and method.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        bounds = [_format_float(bound) for bound in self.bucket_bounds] + ["+Inf"]
+        for (route, method), totals in sorted(merged.items()):
+            labels = _labels(route=route, method=method)
+            cumulative = 0
+            for bound, count in zip(bounds, totals["buckets"]):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {totals['latency_sum']!r}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(**labels: str) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+def _format_float(value: float) -> str:
+    return repr(value) if value != int(value) else f"{value:.1f}"
+
+
+request_metrics = RequestMetrics(LATENCY_BUCKETS, METRICS_DIR)
+
+metrics_publisher = PeriodicTask(
+    "Metrics publisher", request_metrics.publish, interval=settings.metrics_publish_interval
+)
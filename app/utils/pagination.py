@@ -0,0 +1,137 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import select, func, tuple_, literal, type_coerce, String
+
+# Upper bound for the ``limit`` parameter of paginated list endpoints
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(position: dict) -> str:
+    """
+    Encode a keyset position into an opaque, URL-safe cursor string
+
+    Args:
+        position (dict): Sort key values of the last row on the current page
+
+    Returns:
+        str: Cursor to pass back as ``cursor`` to fetch the next page
+    """
+    raw = json.dumps(position, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: Optional[str]) -> Optional[dict]:
+    """
+    Decode a cursor produced by encode_cursor
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(position, dict):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return position
+
+def _is_datetime(column) -> bool:
+    return column.type.python_type is datetime
+
+def _cursor_value(column, raw):
+    # Sort values come back from JSON as strings or numbers; turn them into the column's type
+    python_type = column.type.python_type
+    if python_type is datetime:
+        # Kept as the database returned it (see _raw_sort_value) and compared as such,
+        # only checked to be a timestamp
+        datetime.fromisoformat(raw)
+        return literal(raw, String())
+    return python_type(raw)
+
+def _raw_sort_value(column):
+    """
+    ``column`` as stored, for the cursor of a datetime sort key
+
+    SQLite keeps timestamps as text, and rows written by CURRENT_TIMESTAMP
+    ("... 12:00:00") sort below the ("... 12:00:00.000000") form SQLAlchemy
+    binds a datetime as, so a bound datetime can skip or repeat rows of the
+    same second. The stored text, bound back as is, compares exactly; MySQL
+    converts it back to a DATETIME.
+    """
+    return type_coerce(column, String()).label("cursor_value")
+
+def keyset_statement(statement, id_column, cursor: Optional[str], sort_column=None, descending: bool = False):
+    """
+    Restrict ``statement`` to the rows after the cursor and order it by (sort_column, id)
+
+    Without ``sort_column`` rows are ordered by id alone and the cursor holds the
+    last id; otherwise the cursor also holds the last sort value and the
+    position is compared as a row value, which indexes on
+    (..., sort_column) can serve as a range.
+    """
+    position = decode_cursor(cursor)
+    if position is not None:
+        try:
+            last_id = int(position["id"])
+            last_value = _cursor_value(sort_column, position["value"]) if sort_column is not None else None
+        except (KeyError, TypeError, ValueError, ArithmeticError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if sort_column is None:
+            statement = statement.where(id_column < last_id if descending else id_column > last_id)
+        else:
+            key, last_key = tuple_(sort_column, id_column), tuple_(last_value, last_id)
+            statement = statement.where(key < last_key if descending else key > last_key)
+
+    order = [sort_column, id_column] if sort_column is not None else [id_column]
+    return statement.order_by(*(column.desc() if descending else column for column in order))
+
+async def keyset_page(db, statement, id_column, cursor: Optional[str], limit: int, sort_column=None, descending: bool = False):
+    """
+    Fetch one page of ``statement`` ordered by ``sort_column`` (then ``id_column``), starting after the cursor
+
+    Only ``limit + 1`` rows are read through the primary key index, or an
+    index ending in the sort column, so the cost of a page does not depend on
+    how deep into the result set it is.
+
+    Returns:
+        tuple: (rows, next_cursor), next_cursor is None on the last page
+    """
+    statement = keyset_statement(statement, id_column, cursor, sort_column, descending)
+    raw_values = sort_column is not None and _is_datetime(sort_column)
+    if raw_values:
+        result = (await db.execute(statement.add_columns(_raw_sort_value(sort_column)).limit(limit + 1))).all()
+        rows, values = [row[0] for row in result], [row[1] for row in result]
+    else:
+        rows = (await db.scalars(statement.limit(limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        position = {"id": rows[-1].id}
+        if sort_column is not None:
+            position["value"] = values[limit - 1] if raw_values else getattr(rows[-1], sort_column.key)
+        next_cursor = encode_cursor(position)
+    return rows, next_cursor
+
+async def keyset_page_version(
+    db, statement, id_column, version_column, cursor: Optional[str], limit: int, sort_column=None, descending: bool = False
+):
+    """
+    Aggregate over the rows keyset_page would return for the same arguments
+
+    Only the id and version columns of the page are read, so clients can be told
+    the page is unchanged without loading or serializing it.
+
+    Args:
+        version_column: Column incremented by every update of a row
+
+    Returns:
+        tuple: (row count, max id, sum of ids, sum of versions)
+    """
+    columns = statement.with_only_columns(id_column.label("id"), version_column.label("version"))
+    page = keyset_statement(columns, id_column, cursor, sort_column, descending).limit(limit + 1).subquery()
+    summary = select(func.count(), func.max(page.c.id), func.sum(page.c.id), func.sum(page.c.version))
+    return tuple((await db.execute(summary)).one())
@@ -0,0 +1,74 @@
+import asyncio
+import time
+from typing import Callable, Optional
+from starlette.concurrency import run_in_threadpool
+
+
+class PeriodicTask:
+    """
+    Runs a blocking job every ``interval`` seconds from a background task on
+    the event loop, in the threadpool so the loop is never blocked.
+
+    A run that raises is counted and printed; the next run happens on
+    schedule. Runs never overlap.
+    """
+
+    def __init__(self, name: str, func: Callable[[], Optional[dict]], interval: float):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.runs = 0
+        self.failures = 0
+        self.last_run: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        # Whatever the job returned on its last successful run, e.g. rows processed
+        self.last_result: Optional[dict] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run_once(self):
+        started = time.monotonic()
+        self.last_run = time.time()
+        try:
+            self.last_result = await run_in_threadpool(self.func)
+            self.runs += 1
+        except Exception as e:
+            self.failures += 1
+            print(f"{self.name} failed: {e}")
+        finally:
+            self.last_duration = time.monotonic() - started
+
+    async def _run(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "running": self.running,
+            "interval": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run": self.last_run,
+            "last_duration": self.last_duration,
+            "last_result": self.last_result,
+        }
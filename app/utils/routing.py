@@ -0,0 +1,34 @@
+from typing import Dict
+from starlette.routing import Mount
+from starlette.types import Scope
+
+# Recorded for requests that matched no route (404s, scans), so that random
+# paths do not each become a separate series
+UNMATCHED_ROUTE = "<unmatched>"
+
+_templates: Dict[int, Dict[object, str]] = {}
+
+def _route_templates(router) -> Dict[object, str]:
+    templates = _templates.get(id(router))
+    if templates is None:
+        templates = {}
+        for route in router.routes:
+            if isinstance(route, Mount):
+                templates.setdefault(route.app, route.path + "/{path}")
+            elif hasattr(route, "endpoint"):
+                templates.setdefault(route.endpoint, route.path)
+        _templates[id(router)] = templates
+    return templates
+
+def route_template(scope: Scope) -> str:
+    """
+    Path template of the route that handled a request, e.g. ``/products/{product_id}``
+
+    Only meaningful once the request has gone through the router, which
+    records the matched endpoint in the scope.
+    """
+    endpoint = scope.get("endpoint")
+    router = scope.get("router")
+    if endpoint is None or router is None:
+        return UNMATCHED_ROUTE
+    return _route_templates(router).get(endpoint, UNMATCHED_ROUTE)
@@ -0,0 +1,113 @@
+import re
+from typing import List, Optional
+from fastapi import HTTPException
+from sqlalchemy import select, func, literal, union_all, text, column, case, and_, or_
+from sqlalchemy.dialects.mysql import match
+from app.models.product import Product
+from app.utils.pagination import decode_cursor, encode_cursor
+
+# Longest query accepted by /products/search
+MAX_QUERY_LENGTH = 200
+
+def search_terms(query: str) -> List[str]:
+    """Split a query into word terms; full-text operators and punctuation are dropped."""
+    return re.findall(r"\w+", query.lower())
+
+def _fulltext_matches(dialect: str, terms: List[str]):
+    """Ids and relevance (higher is better) of products whose name, sku or description contain every term as a prefix."""
+    if dialect == "mysql":
+        relevance = match(Product.name, Product.sku, Product.description,
+                          against=" ".join(f"+{term}*" for term in terms)).in_boolean_mode()
+        return select(Product.id.label("id"), relevance.label("score")).where(relevance > 0)
+    if dialect == "sqlite":
+        # products_fts is the FTS5 mirror created with the products table; bm25 is lower for better matches
+        fts_query = " ".join('"' + term + '"*' for term in terms)
+        return (
+            select(column("rowid").label("id"), (-func.bm25(text("products_fts"))).label("score"))
+            .select_from(text("products_fts"))
+            .where(text("products_fts MATCH :fts_query").bindparams(fts_query=fts_query))
+        )
+    raise HTTPException(status_code=501, detail=f"Search is not supported on {dialect}")
+
+def _sku_prefix(dialect: str, query: str):
+    if dialect == "sqlite":
+        # SQLite's LIKE is case-insensitive and cannot use the binary SKU index,
+        # so match the prefix as a range; SKUs are stored upper case
+        prefixes = {query, query.upper()}
+        return or_(*(and_(Product.sku >= prefix, Product.sku < prefix + "\U0010ffff") for prefix in prefixes))
+    # MySQL uses the SKU index for LIKE 'prefix%'
+    return Product.sku.startswith(query, autoescape=True)
+
+def search_statement(dialect: str, query: str, offset: int, limit: int):
+    """
+    Products ``offset`` to ``offset + limit`` matching ``query``, best first
+
+    A product matches when its SKU starts with the query or when its name, SKU
+    or description contain every term (as a word prefix). SKU prefix matches
+    come first, by id; the rest are ordered by full-text relevance, then id.
+    Each branch is an index lookup (the unique SKU index, and the FULLTEXT
+    index or the FTS5 table on SQLite) that only hands on its best
+    ``offset + limit`` ids, so ranking cost does not grow with the number of
+    products sharing a common word beyond what the index itself does.
+    """
+    window = offset + limit
+    branches = [
+        select(Product.id.label("id"), literal(0.0).label("score"), literal(1).label("sku_match"))
+        .where(_sku_prefix(dialect, query))
+        .order_by(Product.id)
+        .limit(window)
+    ]
+    terms = search_terms(query)
+    if terms:
+        fulltext = _fulltext_matches(dialect, terms).subquery()
+        branches.append(
+            select(fulltext.c.id, fulltext.c.score, literal(0).label("sku_match"))
+            .order_by(fulltext.c.score.desc(), fulltext.c.id)
+            .limit(window)
+        )
+    candidates = union_all(*(branch.subquery().select() for branch in branches)).subquery()
+    ranked = (
+        select(
+            candidates.c.id,
+            func.max(candidates.c.sku_match).label("sku_match"),
+            func.max(candidates.c.score).label("score"),
+        )
+        .group_by(candidates.c.id)
+        .subquery()
+    )
+    # SKU matches are ordered by id alone, the way their branch picked them
+    relevance = case((ranked.c.sku_match == 1, 0.0), else_=ranked.c.score)
+    return (
+        select(Product)
+        .join(ranked, ranked.c.id == Product.id)
+        .order_by(ranked.c.sku_match.desc(), relevance.desc(), Product.id)
+        .offset(offset)
+        .limit(limit)
+    )
+
+async def search_page(db, query: str, cursor: Optional[str], limit: int):
+    """
+    One page of search results
+
+    Results are ranked, not ordered by id, so the cursor holds an offset.
+
+    Returns:
+        tuple: (products, next_cursor), next_cursor is None on the last page
+    """
+    offset = 0
+    position = decode_cursor(cursor)
+    if position is not None:
+        try:
+            offset = int(position["offset"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if offset < 0:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    statement = search_statement(db.bind.dialect.name, query, offset, limit + 1)
+    products = (await db.scalars(statement)).all()
+    next_cursor = None
+    if len(products) > limit:
+        products = products[:limit]
+        next_cursor = encode_cursor({"offset": offset + limit})
+    return products, next_cursor
@@ -0,0 +1,111 @@
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from sqlalchemy import select
+from app.config import settings
+from app.database import session_scope
+from app.models.token_revocation import TokenRevocation
+from app.utils.periodic import PeriodicTask
+
+# Rows are read by id, but ids are not committed in order under concurrent
+# inserts; re-reading the last few ids on every refresh picks up late commits
+REFRESH_OVERLAP = 100
+# Expired entries are dropped at most this often, in seconds
+PRUNE_INTERVAL = 60.0
+
+
+class TokenRevocationFilter:
+    """
+    In-memory copy of the unexpired rows of ``token_revocations``
+
+    Holds the jti of every revoked token and, per user, the lowest token
+    version still valid, so a signed token can be checked without a query.
+    ``refresh`` only reads the rows added since the previous refresh. Tokens
+    revoked in this worker are added straight away; revocations from other
+    workers show up within one refresh interval.
+
+    ``fresh`` is False until the first refresh and whenever the last
+    successful one is more than ``max_staleness`` seconds old, so callers
+    can fall back to the database rather than trust an outdated filter.
+    """
+
+    def __init__(self, max_staleness: float):
+        self.max_staleness = max_staleness
+        self._jtis: Dict[str, datetime] = {}
+        # username -> (lowest valid token version, expiry of the revocation)
+        self._user_versions: Dict[str, Tuple[int, datetime]] = {}
+        self._last_id = 0
+        self._refreshed_at: Optional[float] = None
+        self._pruned_at = time.monotonic()
+        # Refreshes run in the threadpool, revocations on the event loop
+        self._lock = threading.Lock()
+
+    def fresh(self) -> bool:
+        return self._refreshed_at is not None and time.monotonic() - self._refreshed_at <= self.max_staleness
+
+    def is_revoked(self, jti: str, username: str, version: int) -> bool:
+        if jti in self._jtis:
+            return True
+        revoked = self._user_versions.get(username)
+        return revoked is not None and version < revoked[0]
+
+    def revoke(self, jti: str, expires_at: datetime):
+        with self._lock:
+            self._jtis[jti] = expires_at
+
+    def revoke_user(self, username: str, version: int, expires_at: datetime):
+        with self._lock:
+            current = self._user_versions.get(username)
+            if current is None or current[0] <= version:
+                self._user_versions[username] = (version, max(expires_at, current[1]) if current else expires_at)
+
+    def _add(self, row: TokenRevocation):
+        if row.jti is not None:
+            self.revoke(row.jti, row.expires_at)
+        if row.username is not None and row.token_version is not None:
+            self.revoke_user(row.username, row.token_version, row.expires_at)
+
+    def _prune(self, now: datetime):
+        with self._lock:
+            self._jtis = {jti: expires_at for jti, expires_at in self._jtis.items() if expires_at > now}
+            self._user_versions = {
+                username: revoked for username, revoked in self._user_versions.items() if revoked[1] > now
+            }
+
+    def refresh(self) -> dict:
+        """Load the rows added since the last refresh. Blocking; runs in the threadpool."""
+        now = datetime.now()
+        with session_scope() as db:
+            rows = db.scalars(
+                select(TokenRevocation)
+                .where(TokenRevocation.id > self._last_id - REFRESH_OVERLAP, TokenRevocation.expires_at > now)
+                .order_by(TokenRevocation.id)
+            ).all()
+        for row in rows:
+            self._add(row)
+        if rows:
+            self._last_id = max(self._last_id, rows[-1].id)
+        if time.monotonic() - self._pruned_at >= PRUNE_INTERVAL:
+            self._prune(now)
+            self._pruned_at = time.monotonic()
+        self._refreshed_at = time.monotonic()
+        return {"rows_read": len(rows)}
+
+    def stats(self) -> dict:
+        return {
+            "fresh": self.fresh(),
+            "revoked_tokens": len(self._jtis),
+            "revoked_users": len(self._user_versions),
+            "last_id": self._last_id,
+            "seconds_since_refresh": (
+                time.monotonic() - self._refreshed_at if self._refreshed_at is not None else None
+            ),
+        }
+
+
+revocation_filter = TokenRevocationFilter(max_staleness=settings.auth_revocation_max_staleness)
+
+revocation_refresher = PeriodicTask(
+    "Token revocation refresh", revocation_filter.refresh, interval=settings.auth_revocation_refresh_interval
+)
@@ -0,0 +1,73 @@
+import asyncio
+from concurrent.futures import Executor, Future
+from fastapi import HTTPException
+
+class BoundedExecutor:
+    """
+    Runs blocking calls on a dedicated executor from async code, with a cap on
+    how many calls may be running or waiting at once.
+
+    Calls beyond ``max_pending`` are rejected straight away with a 503 instead
+    of piling up behind the workers, so a burst cannot grow the queue (and the
+    latency of every caller) without bound. A call holds its slot until the
+    executor is done with it: if the caller is cancelled (e.g. the client
+    disconnected), a call still queued is cancelled, but one already running
+    keeps its slot until it finishes.
+    """
+
+    def __init__(self, executor: Executor, max_pending: int, name: str):
+        self.executor = executor
+        self.max_pending = max_pending
+        self.name = name
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.rejected = 0
+
+    async def run(self, func, *args):
+        # Counters are only touched from the event loop thread, so no lock is needed
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail=f"{self.name} is busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+        loop = asyncio.get_running_loop()
+        future = self.executor.submit(func, *args)
+        self.pending += 1
+        future.add_done_callback(lambda done: self._call_soon(loop, done))
+        # Cancelling the wrapper cancels the call only if it has not started yet
+        return await asyncio.wrap_future(future)
+
+    def _call_soon(self, loop, future: Future):
+        # Done callbacks run in a worker thread; the counters are updated on the loop
+        try:
+            loop.call_soon_threadsafe(self._finished, future)
+        except RuntimeError:
+            # The loop is closed, at shutdown
+            pass
+
+    def _finished(self, future: Future):
+        self.pending -= 1
+        if future.cancelled():
+            self.cancelled += 1
+        elif future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,93 @@
+"""
+Cost of authenticating a request in each auth mode.
+
+Calls get_current_active_user the way FastAPI does for every authenticated
+request, with a fresh session each time, and counts the SQL statements it
+runs. "database" is the DB-checked mode with the token cache disabled (every
+request misses, as on a cold or busy worker) and with it enabled.
+"stateless" trusts the signed claims and checks the in-memory revocation
+filter, here holding BENCH_REVOKED revoked tokens, with the signature
+checked on every request ("new token") and with verified claims cached:
+
+    python -m benchmarks.bench_auth_modes
+    BENCH_AUTH_CALLS=20000 BENCH_REVOKED=100000 python -m benchmarks.bench_auth_modes
+"""
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from sqlalchemy import event
+
+import app.auth as auth
+from app.config import settings
+from app.database import Base, engine, AsyncSessionLocal, async_engine, dispose_engines
+from app.models.user import User as UserModel
+from app.utils.token_revocation import revocation_filter
+
+CALLS = int(os.environ.get("BENCH_AUTH_CALLS", 5000))
+REVOKED = int(os.environ.get("BENCH_REVOKED", 10000))
+
+statements = 0
+
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    global statements
+    statements += 1
+
+
+async def issue_token() -> str:
+    async with AsyncSessionLocal() as db:
+        user = UserModel(username=f"bench-{uuid.uuid4().hex[:8]}", email=f"{uuid.uuid4().hex[:8]}@example.com",
+                         hashed_password="x", is_active=True, token_version=0)
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+        return await auth.create_access_token(auth.token_claims(user), db)
+
+
+async def measure(mode: str, token: str, cached: bool):
+    global statements
+    settings.auth_mode = mode
+    auth.invalidate_token(token)
+    statements = 0
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        if not cached:
+            auth.invalidate_token(token)
+        async with AsyncSessionLocal() as db:
+            await auth.get_current_active_user(token, db)
+    elapsed = time.perf_counter() - start
+    return elapsed / CALLS * 1e6, statements / CALLS
+
+
+async def main():
+    Base.metadata.create_all(engine)
+    token = await issue_token()
+    expires_at = datetime.now() + timedelta(hours=4)
+    for _ in range(REVOKED):
+        revocation_filter.revoke(uuid.uuid4().hex, expires_at)
+    # Marks the filter as up to date, as the refresher does at startup
+    await asyncio.get_running_loop().run_in_executor(None, revocation_filter.refresh)
+
+    results = {
+        "database, cache miss": await measure("database", token, cached=False),
+        "database, cached": await measure("database", token, cached=True),
+        "stateless, new token": await measure("stateless", token, cached=False),
+        "stateless, cached": await measure("stateless", token, cached=True),
+    }
+    print(f"{CALLS} calls, {REVOKED} revoked tokens in the filter")
+    print(f"{'mode':<24}{'us/request':>12}{'queries/request':>18}")
+    for name, (microseconds, queries) in results.items():
+        print(f"{name:<24}{microseconds:>12.1f}{queries:>18.2f}")
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
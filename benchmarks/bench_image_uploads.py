@@ -0,0 +1,95 @@
+"""
+Throughput of concurrent large image uploads, and event loop latency meanwhile.
+
+Runs the app in-process through httpx's ASGI transport with uploads written to
+a temporary directory. Each round uploads ``concurrency`` files at once, either
+all distinct or all identical (deduplicated to one stored file), while ``GET /``
+is probed to show whether the event loop stays responsive:
+
+    python -m benchmarks.bench_image_uploads
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+workdir = tempfile.mkdtemp()
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+os.environ.setdefault("UPLOAD_DIR", os.path.join(workdir, "uploads"))
+os.environ.setdefault("IMAGE_UPLOAD_MAX_BYTES", str(64 * 1024 * 1024))
+
+import httpx
+from sqlalchemy import func, select
+from app.database import Base, engine, SessionLocal, dispose_engines
+from app.main import app
+from app.models.category import Category
+from app.models.image_blob import ImageBlob
+from app.models.product import Product
+from app.models.product_image import ProductImage
+
+FILE_SIZE = 16 * 1024 * 1024
+CONCURRENCY = [1, 4, 16]
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+async def upload_round(client, payloads):
+    done = asyncio.Event()
+
+    async def upload(payload):
+        response = await client.post(
+            "/products/1/images/", files={"file": ("bench.jpg", payload, "image/jpeg")}
+        )
+        return response.status_code
+
+    async def probe():
+        latencies = []
+        while not done.is_set():
+            start = time.perf_counter()
+            await client.get("/")
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0.005)
+        return latencies
+
+    probe_task = asyncio.create_task(probe())
+    start = time.perf_counter()
+    statuses = await asyncio.gather(*(upload(payload) for payload in payloads))
+    elapsed = time.perf_counter() - start
+    done.set()
+    return statuses, elapsed, await probe_task
+
+async def main():
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        if db.get(Product, 1) is None:
+            db.add(Product(id=1, name="bench", sku="bench-upload", price=1, stock=1))
+            db.commit()
+
+    print(f"{FILE_SIZE // (1024 * 1024)} MiB per file, uploads stored in {os.environ['UPLOAD_DIR']}")
+    print(f"{'content':<10}{'uploads':>8}{'MiB/s':>9}{'non-200':>9}{'GET / p50 ms':>14}{'p99 ms':>9}{'blobs':>7}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for concurrency in CONCURRENCY:
+            shared = os.urandom(FILE_SIZE)
+            for label, payloads in (
+                ("distinct", [os.urandom(FILE_SIZE) for _ in range(concurrency)]),
+                ("identical", [shared] * concurrency),
+            ):
+                statuses, elapsed, latencies = await upload_round(client, payloads)
+                with SessionLocal() as db:
+                    blobs = db.scalar(select(func.count()).select_from(ImageBlob))
+                print(
+                    f"{label:<10}{concurrency:>8}{concurrency * FILE_SIZE / elapsed / (1024 * 1024):>9.1f}"
+                    f"{sum(status != 200 for status in statuses):>9}"
+                    f"{statistics.median(latencies) * 1000:>14.2f}{percentile(latencies, 0.99) * 1000:>9.2f}"
+                    f"{blobs:>7}"
+                )
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
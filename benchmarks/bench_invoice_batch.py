@@ -0,0 +1,66 @@
+"""
+Throughput of batch invoice rendering as worker processes are added.
+
+Renders BENCH_INVOICES invoices (2,000 by default) into a ZIP archive, the way
+python pdf.py --batch does, once per worker count: 1, 2, 4, ... up to the
+number of cores, or the counts in BENCH_WORKERS. Speedup is relative to one
+worker; efficiency is speedup per worker. Output is discarded:
+
+    python -m benchmarks.bench_invoice_batch
+    BENCH_WORKERS=1,2,4,8,16 BENCH_INVOICES=10000 python -m benchmarks.bench_invoice_batch
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.config import settings
+from app.utils.invoice_batch import InvoiceZip, render_invoices
+
+INVOICES = int(os.environ.get("BENCH_INVOICES", 2000))
+CORES = os.cpu_count() or 1
+WORKER_COUNTS = [int(n) for n in os.environ.get("BENCH_WORKERS", "").split(",") if n] or sorted(
+    {2 ** power for power in range(CORES.bit_length()) if 2 ** power <= CORES} | {CORES}
+)
+
+
+def specs():
+    for n in range(INVOICES):
+        yield {
+            "invoice_number": f"EOD-{n:07d}",
+            "customer_name": "John Doe",
+            "customer_address": "456 Main Street, Anytown, USA",
+            "items": [
+                {"name": "Laptop Delivery", "quantity": 2, "unit_price": 50.00},
+                {"name": "Express Shipping", "quantity": 1, "unit_price": 25.00},
+            ],
+        }
+
+
+def run(workers: int) -> float:
+    archive = InvoiceZip()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Start the workers (and their imports) before timing
+        list(executor.map(abs, range(workers)))
+        start = time.perf_counter()
+        for result in render_invoices(specs(), executor, settings.invoice_batch_chunk_size, 2 * workers):
+            archive.add(result)
+            archive.take()
+        archive.close()
+        elapsed = time.perf_counter() - start
+    assert archive.rendered == INVOICES, archive.failures[:3]
+    return elapsed
+
+
+def main():
+    print(f"{INVOICES} invoices, {CORES} cores, chunks of {settings.invoice_batch_chunk_size}")
+    print(f"{'workers':>8}{'seconds':>10}{'invoices/s':>12}{'speedup':>9}{'efficiency':>12}")
+    baseline = None
+    for workers in WORKER_COUNTS:
+        elapsed = run(workers)
+        baseline = baseline or elapsed
+        speedup = baseline / elapsed
+        print(f"{workers:>8}{elapsed:>10.2f}{INVOICES / elapsed:>12.1f}{speedup:>9.2f}{speedup / workers:>11.0%}")
+
+
+if __name__ == "__main__":
+    main()
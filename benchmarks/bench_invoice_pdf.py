@@ -0,0 +1,128 @@
+"""
+Invoices per second of the PDF renderer, before and after in-memory rendering.
+
+"before" is the original DeliveryInvoice.generate_pdf: a new style sheet and
+table styles per invoice, a throwaway canvas per barcode and the PDF written
+to a file. "after" is app.utils.invoice_pdf rendering into memory with shared
+styles, for new invoices (every barcode is drawn) and for invoices rendered
+again (barcode flowable cached). Single process, no server involved:
+
+    python -m benchmarks.bench_invoice_pdf
+    BENCH_INVOICES=1000 python -m benchmarks.bench_invoice_pdf
+"""
+import os
+import tempfile
+import time
+from datetime import date
+
+from reportlab.graphics.barcode import code128
+from reportlab.graphics.shapes import Drawing
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
+from app.utils.invoice_pdf import render_invoice
+
+INVOICES = int(os.environ.get("BENCH_INVOICES", 300))
+# Best of this many rounds is reported, to keep noise from other processes out
+ROUNDS = 3
+
+ITEMS = [
+    {"name": "Laptop Delivery", "quantity": 2, "unit_price": 50.00},
+    {"name": "Express Shipping", "quantity": 1, "unit_price": 25.00},
+    {"name": "Insurance", "quantity": 1, "unit_price": 9.99},
+]
+
+
+def invoice(n: int) -> dict:
+    return {
+        "invoice_number": f"INV-2024-{n:06d}",
+        "customer_name": "John Doe",
+        "customer_address": "456 Main Street, Anytown, USA",
+        "items": ITEMS,
+        "barcode_data": f"INV2024{n:06d}",
+    }
+
+
+def legacy_generate_pdf(data: dict, filename: str):
+    # The original pdf.py implementation, kept here as the baseline
+    styles = getSampleStyleSheet()
+    doc = SimpleDocTemplate(filename, pagesize=letter)
+    story = [
+        Paragraph("ACME Delivery Services", styles['Title']),
+        Paragraph("123 Delivery Street, Logistics City", styles['Normal']),
+        Paragraph("Phone: (555) 123-4567", styles['Normal']),
+        Paragraph(" ", styles['Normal']),
+    ]
+    barcode = code128.Code128(data["barcode_data"])
+    barcode.barWidth = 1.2
+    barcode.barHeight = 0.5*inch
+    barcode.drawOn(canvas.Canvas(Drawing(2*inch, 0.5*inch)), (2*inch - barcode.width) / 2, 0)
+    details = [
+        ["Invoice Number", data["invoice_number"]],
+        ["Invoice Date", date.today().strftime("%B %d, %Y")],
+        ["Customer", data["customer_name"]],
+        ["Delivery Address", data["customer_address"]],
+        ["Barcode", barcode],
+    ]
+    details_table = Table(details, colWidths=[3*inch, 4*inch])
+    details_table.setStyle(TableStyle([
+        ('BACKGROUND', (0,0), (0,-1), colors.lightgrey),
+        ('GRID', (0,0), (-1,-1), 1, colors.black),
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ('ALIGN', (0,0), (1,-1), 'CENTER')
+    ]))
+    story.append(details_table)
+    story.append(Paragraph(" ", styles['Normal']))
+    table_data = [["Item", "Quantity", "Unit Price", "Total"]]
+    for item in data["items"]:
+        table_data.append([
+            item['name'], item['quantity'], f"${item['unit_price']:.2f}", f"${item['quantity'] * item['unit_price']:.2f}"
+        ])
+    total = sum(item['quantity'] * item['unit_price'] for item in data["items"])
+    table_data.append(["", "", "Total:", f"${total:.2f}"])
+    items_table = Table(table_data, colWidths=[3*inch, 1*inch, 1.5*inch, 1.5*inch])
+    items_table.setStyle(TableStyle([
+        ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+        ('GRID', (0,0), (-1,-1), 1, colors.black),
+        ('ALIGN', (0,0), (-1,-1), 'CENTER')
+    ]))
+    story.append(items_table)
+    story.append(Paragraph(" ", styles['Normal']))
+    story.append(Paragraph("Thank you for your business!", styles['Normal']))
+    doc.build(story)
+
+
+def rate(render) -> float:
+    best = 0.0
+    for round_number in range(ROUNDS):
+        start = time.perf_counter()
+        for n in range(INVOICES):
+            render(round_number * INVOICES + n)
+        best = max(best, INVOICES / (time.perf_counter() - start))
+    return best
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    # Warm up imports and fonts so neither side pays for them
+    legacy_generate_pdf(invoice(0), os.path.join(directory, "warmup.pdf"))
+    render_invoice(invoice(0))
+
+    results = {
+        "before: file, rebuilt styles": rate(
+            lambda n: legacy_generate_pdf(invoice(n), os.path.join(directory, f"{n}.pdf"))
+        ),
+        "after: memory, new invoices": rate(lambda n: render_invoice(invoice(1_000_000 + n))),
+        "after: memory, re-rendered": rate(lambda n: render_invoice(invoice(0))),
+    }
+    print(f"{INVOICES} invoices, best of {ROUNDS} rounds")
+    print(f"{'renderer':<32}{'invoices/s':>12}")
+    for name, invoices_per_second in results.items():
+        print(f"{name:<32}{invoices_per_second:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
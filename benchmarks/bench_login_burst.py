@@ -0,0 +1,88 @@
+"""
+Latency of a non-auth endpoint while a burst of logins is in flight.
+
+Runs the app in-process through httpx's ASGI transport, so anything that
+blocks the event loop shows up directly in the latency of ``GET /``.
+Compares bcrypt running inline on the event loop (the old behaviour) with
+the bounded password hashing pool:
+
+    python -m benchmarks.bench_login_burst
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+
+import httpx
+import app.auth as auth
+from app.database import Base, engine, SessionLocal, async_engine
+from app.main import app
+from app.models.user import User as UserModel
+
+LOGINS = 40
+PROBES = 100
+
+
+class InlineHashing:
+    """Stand-in for auth.password_hash_pool that hashes on the calling thread."""
+
+    async def run(self, func, *args):
+        return func(*args)
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+async def burst(client):
+    async def login():
+        response = await client.post("/login", json={"username": "bench", "password": "bench-password"})
+        return response.status_code
+
+    async def probe():
+        latencies = []
+        for _ in range(PROBES):
+            start = time.perf_counter()
+            await client.get("/")
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0.005)
+        return latencies
+
+    start = time.perf_counter()
+    probe_task = asyncio.create_task(probe())
+    statuses = await asyncio.gather(*(login() for _ in range(LOGINS)))
+    login_time = time.perf_counter() - start
+    latencies = await probe_task
+    return statuses, login_time, latencies
+
+async def main():
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        if not db.query(UserModel).filter(UserModel.username == "bench").first():
+            db.add(UserModel(username="bench", email="bench@example.com",
+                             hashed_password=auth.get_password_hash("bench-password")))
+            db.commit()
+
+    pool = auth.password_hash_pool
+    print(f"{LOGINS} concurrent logins, bcrypt rounds={auth.pwd_context.to_dict()['bcrypt__rounds']}")
+    print(f"{'hashing':<10}{'logins/s':>10}{'503s':>6}{'GET / p50 ms':>14}{'p99 ms':>9}{'max ms':>9}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label, runner in (("inline", InlineHashing()), ("pool", pool)):
+            auth.password_hash_pool = runner
+            statuses, login_time, latencies = await burst(client)
+            print(
+                f"{label:<10}{LOGINS / login_time:>10.1f}{statuses.count(503):>6}"
+                f"{statistics.median(latencies) * 1000:>14.2f}"
+                f"{percentile(latencies, 0.99) * 1000:>9.2f}{max(latencies) * 1000:>9.2f}"
+            )
+    auth.password_hash_pool = pool
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
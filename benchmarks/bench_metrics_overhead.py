@@ -0,0 +1,76 @@
+"""
+Per-request cost of MetricsMiddleware.
+
+A minimal ASGI app that answers 200 straight away is called directly, with and
+without the middleware in front of it, and the difference per request is the
+time spent recording the status and latency. No server or database involved:
+
+    python -m benchmarks.bench_metrics_overhead
+    BENCH_REQUESTS=500000 python -m benchmarks.bench_metrics_overhead
+"""
+import asyncio
+import os
+import time
+
+from app.middleware.metrics import MetricsMiddleware
+from app.utils.metrics import request_metrics
+
+REQUESTS = int(os.environ.get("BENCH_REQUESTS", 200_000))
+# Best of this many rounds is reported, to keep noise from other processes out
+ROUNDS = 3
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+def scope(n: int) -> dict:
+    # What the router leaves in the scope, so the route template lookup is included
+    return {"type": "http", "method": "GET", "path": f"/products/{n}", "endpoint": endpoint, "router": router}
+
+
+class _Route:
+    path = "/products/{product_id}"
+    endpoint = endpoint
+
+
+class _Router:
+    routes = [_Route()]
+
+
+router = _Router()
+
+
+async def per_request(app) -> float:
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for n in range(REQUESTS):
+            await app(scope(n), receive, send)
+        best = min(best, (time.perf_counter() - start) / REQUESTS)
+    return best
+
+
+async def main():
+    bare = await per_request(endpoint)
+    measured = await per_request(MetricsMiddleware(endpoint))
+    print(f"{REQUESTS} requests, best of {ROUNDS} rounds")
+    print(f"{'app':<28}{'us/request':>12}")
+    print(f"{'without middleware':<28}{bare * 1e6:>12.2f}")
+    print(f"{'with MetricsMiddleware':<28}{measured * 1e6:>12.2f}")
+    print(f"{'overhead':<28}{(measured - bare) * 1e6:>12.2f}")
+    recorded = sum(sum(entry["buckets"]) for entry in request_metrics.snapshot()["routes"])
+    print(f"recorded {recorded} requests")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
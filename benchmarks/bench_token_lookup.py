@@ -0,0 +1,120 @@
+"""
+Latency of the token lookups behind every authenticated request and every
+login, as the tokens table grows.
+
+"before" is the original table: no index on access_token or username, so
+get_current_active_user compares the full JWT string against every row.
+"after" is the current tokens table, looked up by the unique token_hash
+and the (username, expires_at) index. Both tables get the same rows; sizes
+are cumulative:
+
+    python -m benchmarks.bench_token_lookup
+    BENCH_TOKEN_ROWS=10000,100000,1000000,3000000 python -m benchmarks.bench_token_lookup
+"""
+import base64
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, delete, insert, select
+
+from app.auth import hash_token
+from app.database import engine
+from app.models.token import Token as TokenModel
+
+SIZES = [int(size) for size in os.environ.get("BENCH_TOKEN_ROWS", "10000,100000,1000000").split(",")]
+INSERT_CHUNK = 50_000
+# Lookups timed per size; unindexed lookups are slow, so fewer of them
+PROBES = 2000
+LEGACY_PROBES = 20
+USERS = 50_000
+
+legacy_metadata = MetaData()
+legacy_tokens = Table(
+    "bench_legacy_tokens",
+    legacy_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("username", String(50), nullable=False),
+    Column("access_token", String(500), nullable=False),
+    Column("expires_at", DateTime, nullable=False),
+    Column("created_at", DateTime),
+)
+
+
+def fake_jwt(rng: random.Random) -> str:
+    # Same shape and length as the tokens create_access_token issues
+    payload, signature = (base64.urlsafe_b64encode(rng.randbytes(size)).decode().rstrip("=") for size in (48, 32))
+    return f"eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.{payload}.{signature}"
+
+
+def grow(conn, start: int, stop: int, rng: random.Random, samples: list):
+    now = datetime.now()
+    for chunk_start in range(start, stop, INSERT_CHUNK):
+        rows = []
+        for _ in range(chunk_start, min(chunk_start + INSERT_CHUNK, stop)):
+            token = fake_jwt(rng)
+            rows.append({
+                "username": f"bench{rng.randrange(USERS)}",
+                "access_token": token,
+                "token_hash": hash_token(token),
+                # Mostly expired, as they pile up without a sweep
+                "expires_at": now + timedelta(minutes=rng.randint(-60 * 24 * 30, 240)),
+                "created_at": now,
+            })
+        conn.execute(insert(TokenModel), rows)
+        conn.execute(insert(legacy_tokens), [{k: v for k, v in row.items() if k != "token_hash"} for row in rows])
+        samples.extend(rng.sample([(row["access_token"], row["username"]) for row in rows], 10))
+
+
+def per_lookup_ms(conn, statement, probes) -> float:
+    start = time.perf_counter()
+    for parameters in probes:
+        conn.execute(statement(*parameters)).first()
+    return (time.perf_counter() - start) / len(probes) * 1000
+
+
+def main():
+    TokenModel.__table__.create(engine, checkfirst=True)
+    legacy_metadata.create_all(engine)
+    rng = random.Random(1)
+    samples = []
+    lookups = {
+        "auth before": lambda token, username: select(legacy_tokens).where(
+            legacy_tokens.c.access_token == token, legacy_tokens.c.expires_at > datetime.now()
+        ),
+        "auth after": lambda token, username: select(TokenModel).where(
+            TokenModel.token_hash == hash_token(token), TokenModel.expires_at > datetime.now()
+        ),
+        "login before": lambda token, username: select(legacy_tokens).where(
+            legacy_tokens.c.username == username, legacy_tokens.c.expires_at > datetime.now()
+        ),
+        "login after": lambda token, username: select(TokenModel).where(
+            TokenModel.username == username, TokenModel.expires_at > datetime.now()
+        ).order_by(TokenModel.expires_at.desc()).limit(1),
+    }
+    print(f"{'rows':>10}" + "".join(f"{name + ' ms':>16}" for name in lookups))
+    try:
+        rows = 0
+        for size in SIZES:
+            with engine.begin() as conn:
+                grow(conn, rows, size, rng, samples)
+            rows = size
+            with engine.connect() as conn:
+                timings = []
+                for name, statement in lookups.items():
+                    count = LEGACY_PROBES if name.endswith("before") else PROBES
+                    timings.append(per_lookup_ms(conn, statement, [rng.choice(samples) for _ in range(count)]))
+            print(f"{rows:>10}" + "".join(f"{ms:>16.3f}" for ms in timings))
+    finally:
+        with engine.begin() as conn:
+            conn.execute(delete(TokenModel).where(TokenModel.username.like("bench%")))
+        legacy_metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    main()